@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+import kernels
+from catalog import expand_best_fits
 from main import CustomError
 
 
@@ -49,6 +51,740 @@ def calculate_least_square(df_train, df_ideal):
         print("Standard Error:", e)
         # Perform alternative actions or exit the program
 
+def _sorted_by_x(df):
+    """
+    Return the dataset sorted by x. Already sorted datasets are returned unchanged.
+
+    Parameters:
+        df (pd.DataFrame): Dataset with 'x' as the first column and Y columns thereafter.
+
+    Returns:
+        pd.DataFrame: The dataset sorted by x.
+    """
+    if df['x'].is_monotonic_increasing:
+        return df
+    return df.sort_values(by='x', kind='stable')
+
+def _interpolate_columns(x, values, grid):
+    """
+    Linearly interpolate all columns of a matrix onto a sorted grid in one pass.
+
+    The interpolation indices and weights are computed once and applied to all columns.
+    Grid points that coincide with x return the original values exactly.
+
+    Parameters:
+        x (np.ndarray): The sorted x values of the rows.
+        values (np.ndarray): Matrix with one function per column.
+        grid (np.ndarray): The sorted x values to interpolate at, all within [x[0], x[-1]].
+
+    Returns:
+        np.ndarray: The interpolated matrix (grid points x columns).
+    """
+    upper = np.minimum(np.searchsorted(x, grid, side='left'), len(x) - 1)
+    lower = np.maximum(upper - 1, 0)
+    exact = x[upper] == grid
+    span = x[upper] - x[lower]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(exact, 1.0, np.where(span > 0, (grid - x[lower]) / span, 0.0))
+    return values[lower] * (1 - weights[:, None]) + values[upper] * weights[:, None]
+
+def align_to_grid(df_train, df_ideal, grid='train', method='interpolate'):
+    """
+    Bring the training and ideal datasets onto a common x grid.
+
+    The fast fitting functions match rows by position and require identical x values,
+    so datasets sampled on differing x grids have to be aligned first.
+
+    Parameters:
+        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        grid: The common x grid for method 'interpolate': 'train' for the x values of the training dataset,
+              'ideal' for the x values of the ideal dataset, or an array of x values. Grid points outside
+              the x range of either dataset are dropped, there is no extrapolation. Default is 'train'.
+        method (str): 'interpolate' for linear interpolation onto the grid, or 'merge' to keep only the
+                      x values present in both datasets without interpolation. Default is 'interpolate'.
+
+    Returns:
+        tuple: The aligned training and ideal datasets, both sorted by x with identical x columns.
+    """
+    try:
+        if not isinstance(df_train, pd.DataFrame) or not isinstance(df_ideal, pd.DataFrame):
+            raise CustomError("DataFrames df_train and df_ideal must be of type pd.DataFrame")
+
+        df_train = _sorted_by_x(df_train)
+        df_ideal = _sorted_by_x(df_ideal)
+        train_x = df_train['x'].to_numpy(dtype=float)
+        ideal_x = df_ideal['x'].to_numpy(dtype=float)
+
+        if method == 'merge':
+            common_x, train_rows, ideal_rows = np.intersect1d(train_x, ideal_x, return_indices=True)
+            aligned_train = df_train.iloc[train_rows].reset_index(drop=True)
+            aligned_ideal = df_ideal.iloc[ideal_rows].reset_index(drop=True)
+            aligned_train['x'] = common_x
+            aligned_ideal['x'] = common_x
+            return aligned_train, aligned_ideal
+
+        if method != 'interpolate':
+            raise CustomError(f"Unknown alignment method '{method}'")
+
+        if isinstance(grid, str):
+            if grid not in ('train', 'ideal'):
+                raise CustomError(f"Unknown grid '{grid}'")
+            grid = train_x if grid == 'train' else ideal_x
+        grid = np.sort(np.asarray(grid, dtype=float))
+        low = max(train_x[0], ideal_x[0])
+        high = min(train_x[-1], ideal_x[-1])
+        grid = grid[(grid >= low) & (grid <= high)]
+
+        aligned = []
+        for df, x in ((df_train, train_x), (df_ideal, ideal_x)):
+            values = _interpolate_columns(x, df.iloc[:, 1:].to_numpy(dtype=float), grid)
+            aligned_df = pd.DataFrame(values, columns=df.columns[1:])
+            aligned_df.insert(0, 'x', grid)
+            aligned.append(aligned_df)
+        return tuple(aligned)
+
+    except CustomError as e:
+        print("Custom Error:", e.message)
+        # Perform alternative actions or exit the program
+
+    except (TypeError, KeyError, IndexError) as e:
+        print("Standard Error:", e)
+        # Perform alternative actions or exit the program
+
+def _to_matrices(df_train, df_ideal, dtype=np.float64):
+    """
+    Convert the Y-columns of the training and ideal datasets to NumPy matrices.
+
+    Rows are matched by position, like the index alignment in calculate_least_square
+    for datasets with the same row order.
+
+    Parameters:
+        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        dtype (np.dtype): Data type of the matrices. Default is np.float64.
+
+    Returns:
+        tuple: The training matrix (rows x train columns) and the ideal matrix (rows x ideal columns).
+    """
+    if len(df_train) != len(df_ideal):
+        raise CustomError("DataFrames df_train and df_ideal must have the same number of rows, use align_to_grid first")
+    if not np.array_equal(df_train['x'].to_numpy(), df_ideal['x'].to_numpy()):
+        raise CustomError("DataFrames df_train and df_ideal must have the same x values, use align_to_grid first")
+    train = df_train.iloc[:, 1:].to_numpy(dtype=dtype)
+    ideal = df_ideal.iloc[:, 1:].to_numpy(dtype=dtype)
+    return train, ideal
+
+def _squared_diff_matrix(train, ideal, block_size=4096):
+    """
+    Compute the sums of squared differences between all training and ideal columns.
+
+    The rows are processed in blocks, so the temporary differences stay small for long datasets.
+    The differences are computed in the data type of the matrices, the sums are always
+    accumulated in float64.
+
+    Parameters:
+        train (np.ndarray): Training matrix (rows x train columns).
+        ideal (np.ndarray): Ideal matrix (rows x ideal columns).
+        block_size (int): Number of rows per block. Default is 4096.
+
+    Returns:
+        np.ndarray: Matrix of squared differences with one row per training column and one column per ideal column.
+    """
+    squared_diffs = np.zeros((train.shape[1], ideal.shape[1]), dtype=np.float64)
+    for start in range(0, len(train), block_size):
+        ideal_block = ideal[start:start + block_size]
+        train_block = train[start:start + block_size]
+        for idx in range(train.shape[1]):
+            diff = ideal_block - train_block[:, idx, None]
+            squared_diffs[idx] += np.einsum('ij,ij->j', diff, diff, dtype=np.float64)
+    return squared_diffs
+
+def calculate_best_fits(df_train, df_ideal, compact=False, backend='auto', equivalents=None):
+    """
+    Vectorized version of calculate_least_square.
+
+    The squared differences and maximum absolute deviations of all pairs are computed by a fused
+    kernel from the kernels module, which uses Numba if it is installed.
+
+    Parameters:
+        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        compact (bool): If True and the Y-columns of df_ideal are already float32, e.g. from
+                        load_dataframe(compact=True) or load_catalog(compact=True), the scan runs on float32
+                        and the ideal matrix takes half the memory. The squared differences are still summed
+                        in float64. float64 input is scanned as it is, converting it would add a copy.
+                        float32 roughly halves the runtime of the NumPy kernel, the Numba kernel converts
+                        each value to float64 and is not faster. Use verify_compact_precision to check
+                        that the selections match float64. Default is False.
+        backend (str): Kernel backend, 'auto' for the fastest available one, 'numba' or 'numpy'. Default is 'auto'.
+        equivalents (dict): If df_ideal was compacted with catalog.compact_catalog, its equivalent columns.
+                            The best fits are then extended by the list 'equivalent_columns'. The squared
+                            difference is the one of the representative, which is only exact for a
+                            compaction tolerance of 0.
+
+    Returns:
+        dict: A dictionary in the format of calculate_least_square for each Y-column in the training dataset,
+              extended by the 'max_deviation' of the best fit.
+    """
+    try:
+        if not isinstance(df_train, pd.DataFrame) or not isinstance(df_ideal, pd.DataFrame):
+            raise CustomError("DataFrames df_train and df_ideal must be of type pd.DataFrame")
+
+        compact = compact and all(dtype == np.float32 for dtype in df_ideal.dtypes.iloc[1:])
+        train, ideal = _to_matrices(df_train, df_ideal, np.float32 if compact else np.float64)
+        squared_diffs, max_deviations, best = kernels.fused_score(train, ideal, backend)
+
+        best_fits = {}
+        for idx, col_train in enumerate(df_train.columns[1:]):
+            if best[idx] < 0:
+                # Like calculate_least_square, functions with NaN squared differences are never selected
+                best_fits[col_train] = {'best_fit_col_ideal': None, 'squared_diff': float('inf'), 'test_column': col_train}
+                continue
+            best_fits[col_train] = {
+                'best_fit_col_ideal': df_ideal.columns[1:][best[idx]],
+                'squared_diff': float(squared_diffs[idx, best[idx]]),
+                'test_column': col_train,
+                'max_deviation': float(max_deviations[idx, best[idx]])
+            }
+
+        if equivalents is not None:
+            expand_best_fits(best_fits, equivalents)
+        return best_fits
+
+    except CustomError as e:
+        print("Custom Error:", e.message)
+        # Perform alternative actions or exit the program
+
+    except (TypeError, KeyError, IndexError, ValueError) as e:
+        print("Standard Error:", e)
+        # Perform alternative actions or exit the program
+
+def _column_stats(matrix):
+    """
+    Compute the Euclidean norm and the mean of each column.
+
+    Parameters:
+        matrix (np.ndarray): Matrix with one function per column.
+
+    Returns:
+        dict: 'norms' and 'means' as arrays with one value per column.
+    """
+    return {
+        'norms': np.sqrt(np.einsum('ij,ij->j', matrix, matrix)),
+        'means': matrix.mean(axis=0)
+    }
+
+def _check_stats_columns(ideal_stats, df_ideal):
+    """
+    Check that precomputed statistics belong to the ideal dataset.
+
+    The function names, the number of rows and the x grid are compared, as far as they are part of
+    the statistics. The values themselves can't be compared without recomputing the statistics, use
+    CSVLoader3.column_stats(csv_file) to make sure the database has been loaded from the same CSV file.
+
+    Parameters:
+        ideal_stats (dict): Precomputed statistics, optionally with the function names in 'columns',
+                            the number of rows in 'n_rows' and the sorted x grid in 'x'.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+    """
+    if 'columns' in ideal_stats and list(ideal_stats['columns']) != list(df_ideal.columns[1:]):
+        raise CustomError("The precomputed statistics don't match the columns of df_ideal")
+    if 'n_rows' in ideal_stats and ideal_stats['n_rows'] != len(df_ideal):
+        raise CustomError(f"The precomputed statistics cover {ideal_stats['n_rows']} rows, df_ideal has {len(df_ideal)}")
+    ideal_x = np.sort(df_ideal['x'].to_numpy(dtype=float))
+    if 'x' in ideal_stats and not np.array_equal(np.asarray(ideal_stats['x'], dtype=float), ideal_x):
+        raise CustomError("The precomputed statistics don't match the x values of df_ideal")
+
+def _pruned_search(train_y, ideal, train_norm, train_mean, ideal_stats, k, row_block, candidate_block):
+    """
+    Find the k ideal columns with the smallest squared difference to one training column.
+
+    Two cheap lower bounds of the squared difference are computed from the column statistics:
+    (|i| - |t|)² from the reverse triangle inequality and n * (mean(i) - mean(t))², because the sum
+    of squares of a vector is at least n times its squared mean. Candidates are scored in order of
+    their lower bound and in blocks of rows. A candidate is dropped as soon as its bound or its
+    partial sum exceeds the current k-th best squared difference, and the search stops once the
+    bound of the next candidate exceeds it.
+
+    Parameters:
+        train_y (np.ndarray): The training column.
+        ideal (np.ndarray): Ideal matrix (rows x ideal columns).
+        train_norm (float): Euclidean norm of the training column.
+        train_mean (float): Mean of the training column.
+        ideal_stats (dict): 'norms' and 'means' of the ideal columns.
+        k (int): Number of candidates to keep.
+        row_block (int): Number of rows scored before the partial sums are checked.
+        candidate_block (int): Number of candidates scored together.
+
+    Returns:
+        tuple: Indices of the k best ideal columns and their squared differences, best first.
+               Columns with a NaN squared difference are never selected, so fewer than k or no
+               columns are returned if the training column or the ideal columns contain NaN values.
+    """
+    n_rows = len(train_y)
+
+    # The small slack keeps rounding errors of the bounds from pruning an exact tie
+    lower_bounds = np.maximum(
+        (ideal_stats['norms'] - train_norm) ** 2,
+        n_rows * (ideal_stats['means'] - train_mean) ** 2
+    ) * (1 - 1e-9)
+    order = np.argsort(lower_bounds, kind='stable')
+
+    best_idx = np.empty(0, dtype=np.intp)
+    best_sse = np.empty(0, dtype=np.float64)
+    threshold = np.inf
+
+    for start in range(0, len(order), candidate_block):
+        group = order[start:start + candidate_block]
+        if lower_bounds[group[0]] > threshold:
+            # All remaining candidates have an even larger bound
+            break
+        group = group[lower_bounds[group] <= threshold]
+
+        partial = np.zeros(len(group))
+        for row in range(0, n_rows, row_block):
+            diff = ideal[row:row + row_block, group] - train_y[row:row + row_block, None]
+            partial += np.einsum('ij,ij->j', diff, diff)
+
+            # Ties are kept, the column order decides between them below
+            keep = partial <= threshold
+            if not keep.all():
+                group, partial = group[keep], partial[keep]
+                if len(group) == 0:
+                    break
+
+        candidates_idx = np.concatenate([best_idx, group])
+        candidates_sse = np.concatenate([best_sse, partial])
+        top = np.lexsort((candidates_idx, candidates_sse))[:k]
+        best_idx, best_sse = candidates_idx[top], candidates_sse[top]
+        if len(best_idx) == k:
+            threshold = best_sse[-1]
+
+    return best_idx, best_sse
+
+def calculate_best_fits_pruned(df_train, df_ideal, k=1, row_block=32, candidate_block=64, ideal_stats=None):
+    """
+    Calculate the best fits with an early-abandoning search that skips hopeless candidates.
+
+    The selections are identical to the exact search; see _pruned_search for the pruning rules.
+
+    Parameters:
+        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        k (int): Number of ranked candidates to keep per training column. Default is 1.
+        row_block (int): Number of rows scored before the partial sums are checked. Default is 32.
+        candidate_block (int): Number of candidates scored together. Default is 64.
+        ideal_stats (dict): Precomputed 'norms' and 'means' of the ideal columns, e.g. from CSVLoader3.column_stats.
+                            Computed if not given.
+
+    Returns:
+        dict: A dictionary in the format of calculate_least_square for each Y-column in the training dataset,
+              extended by a ranked list 'candidates' of the k best fits.
+    """
+    try:
+        if not isinstance(df_train, pd.DataFrame) or not isinstance(df_ideal, pd.DataFrame):
+            raise CustomError("DataFrames df_train and df_ideal must be of type pd.DataFrame")
+        if k < 1:
+            raise CustomError("k must be at least 1")
+
+        train, ideal = _to_matrices(df_train, df_ideal)
+        ideal_columns = df_ideal.columns[1:]
+        if ideal_stats is None:
+            ideal_stats = _column_stats(ideal)
+        _check_stats_columns(ideal_stats, df_ideal)
+        train_stats = _column_stats(train)
+        k = min(k, ideal.shape[1])
+
+        best_fits = {}
+        for idx, col_train in enumerate(df_train.columns[1:]):
+            best_idx, best_sse = _pruned_search(
+                train[:, idx], ideal, train_stats['norms'][idx], train_stats['means'][idx],
+                ideal_stats, k, row_block, candidate_block
+            )
+            candidates = [
+                {'ideal_column': ideal_columns[j], 'squared_diff': float(sse)}
+                for j, sse in zip(best_idx, best_sse)
+            ]
+            # Like calculate_least_square, no function is selected if all squared differences are NaN
+            best_fits[col_train] = {
+                'best_fit_col_ideal': candidates[0]['ideal_column'] if candidates else None,
+                'squared_diff': candidates[0]['squared_diff'] if candidates else float('inf'),
+                'test_column': col_train,
+                'candidates': candidates
+            }
+
+        return best_fits
+
+    except CustomError as e:
+        print("Custom Error:", e.message)
+        # Perform alternative actions or exit the program
+
+    except (TypeError, KeyError, IndexError) as e:
+        print("Standard Error:", e)
+        # Perform alternative actions or exit the program
+
+def _block_means(matrix, stride):
+    """
+    Aggregate consecutive rows of a matrix into blocks and compute their means.
+
+    Parameters:
+        matrix (np.ndarray): Matrix with one function per column.
+        stride (int): Number of rows per block. The last block may be shorter.
+
+    Returns:
+        tuple: The block means (blocks x columns) and the number of rows per block.
+    """
+    starts = np.arange(0, len(matrix), stride)
+    sizes = np.diff(np.append(starts, len(matrix)))
+    return np.add.reduceat(matrix, starts, axis=0) / sizes[:, None], sizes
+
+def calculate_best_fits_multires(df_train, df_ideal, stride=8, shortlist=10, guarantee=True):
+    """
+    Calculate the best fits with a coarse-to-fine search on an aggregated x grid.
+
+    All ideal functions are first ranked on the block means of `stride` consecutive rows. For a block
+    of s rows, s * (mean(i) - mean(t))² never exceeds the sum of squared differences in that block,
+    so the coarse score is a lower bound of the full squared difference. Only the shortlist with the
+    smallest coarse scores is re-scored at full resolution. The result is certified as exact if no
+    candidate outside the shortlist has a coarse score below the best full score.
+
+    Parameters:
+        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        stride (int): Number of rows aggregated into one coarse grid point. Default is 8.
+        shortlist (int): Number of candidates re-scored at full resolution. Default is 10.
+        guarantee (bool): If True, uncertified results are completed by re-scoring all candidates
+                          whose coarse score is below the best full score, which makes the result exact.
+                          Default is True.
+
+    Returns:
+        dict: A dictionary in the format of calculate_least_square for each Y-column in the training dataset,
+              extended by 'certified' (bool) and the number of candidates 'rescored' at full resolution.
+    """
+    try:
+        if not isinstance(df_train, pd.DataFrame) or not isinstance(df_ideal, pd.DataFrame):
+            raise CustomError("DataFrames df_train and df_ideal must be of type pd.DataFrame")
+        if stride < 1 or shortlist < 1:
+            raise CustomError("stride and shortlist must be at least 1")
+
+        train, ideal = _to_matrices(df_train, df_ideal)
+        ideal_columns = df_ideal.columns[1:]
+
+        # Weighting the block means with sqrt(block size) turns the coarse score into a plain squared difference
+        train_coarse, sizes = _block_means(train, stride)
+        ideal_coarse, _ = _block_means(ideal, stride)
+        weights = np.sqrt(sizes)[:, None]
+        lower_bounds = _squared_diff_matrix(train_coarse * weights, ideal_coarse * weights)
+
+        # The small slack keeps rounding errors of the bounds from excluding an exact tie
+        lower_bounds *= 1 - 1e-9
+
+        best_fits = {}
+        for idx, col_train in enumerate(df_train.columns[1:]):
+            candidates = _rank_candidates(lower_bounds[idx], min(shortlist, ideal.shape[1]))
+            diff = ideal[:, candidates] - train[:, idx, None]
+            squared_diffs = np.einsum('ij,ij->j', diff, diff)
+            rescored = len(candidates)
+
+            # Like calculate_least_square, functions with NaN squared differences are never selected
+            valid = ~np.isnan(squared_diffs)
+            candidates, squared_diffs = candidates[valid], squared_diffs[valid]
+            if len(candidates) == 0:
+                best_fits[col_train] = {
+                    'best_fit_col_ideal': None,
+                    'squared_diff': float('inf'),
+                    'test_column': col_train,
+                    'certified': False,
+                    'rescored': rescored
+                }
+                continue
+
+            best = np.lexsort((candidates, squared_diffs))[0]
+            best_col, best_sse = candidates[best], squared_diffs[best]
+
+            # NaN lower bounds never compare as smaller, so functions with NaN values are never missed
+            excluded = np.ones(ideal.shape[1], dtype=bool)
+            excluded[candidates] = False
+            missed = np.flatnonzero(excluded & (lower_bounds[idx] <= best_sse))
+            certified = len(missed) == 0
+
+            if not certified and guarantee:
+                diff = ideal[:, missed] - train[:, idx, None]
+                missed_sse = np.einsum('ij,ij->j', diff, diff)
+                valid = ~np.isnan(missed_sse)
+                all_idx = np.concatenate([[best_col], missed[valid]])
+                all_sse = np.concatenate([[best_sse], missed_sse[valid]])
+                best = np.lexsort((all_idx, all_sse))[0]
+                best_col, best_sse = all_idx[best], all_sse[best]
+                certified = True
+                rescored += len(missed)
+
+            best_fits[col_train] = {
+                'best_fit_col_ideal': ideal_columns[best_col],
+                'squared_diff': float(best_sse),
+                'test_column': col_train,
+                'certified': certified,
+                'rescored': rescored
+            }
+
+        return best_fits
+
+    except CustomError as e:
+        print("Custom Error:", e.message)
+        # Perform alternative actions or exit the program
+
+    except (TypeError, KeyError, IndexError) as e:
+        print("Standard Error:", e)
+        # Perform alternative actions or exit the program
+
+def calculate_best_fits_batch(train_datasets, df_ideal, block_size=1024, ideal_stats=None):
+    """
+    Calculate the best fits of many training datasets against one shared ideal dataset.
+
+    The Y-columns of all training datasets are stacked into one matrix and scored against the ideal
+    dataset with the expansion sum((t - i)²) = sum(t²) - 2 * sum(t * i) + sum(i²), so the cross terms
+    of all pairs come from one matrix multiplication per block of ideal columns and the column norms
+    of the ideal dataset are computed only once for the whole batch. Candidates within the rounding
+    tolerance of the expansion are re-scored directly, so the selections match the exact search.
+
+    Parameters:
+        train_datasets (dict): Training datasets by name, each with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        block_size (int): Number of ideal columns per matrix multiplication. Default is 1024.
+        ideal_stats (dict): Precomputed 'sum_sq' of the ideal columns, e.g. from CSVLoader3.column_stats.
+                            Computed if not given.
+
+    Returns:
+        dict: The best fits in the format of calculate_least_square for each training dataset by name.
+    """
+    try:
+        if not isinstance(df_ideal, pd.DataFrame) or not all(isinstance(df, pd.DataFrame) for df in train_datasets.values()):
+            raise CustomError("df_ideal and all training datasets must be of type pd.DataFrame")
+
+        ideal = df_ideal.iloc[:, 1:].to_numpy(dtype=np.float64)
+        ideal_columns = df_ideal.columns[1:]
+        if ideal_stats is None:
+            ideal_sq = np.einsum('ij,ij->j', ideal, ideal)
+        else:
+            _check_stats_columns(ideal_stats, df_ideal)
+            ideal_sq = np.asarray(ideal_stats['sum_sq'], dtype=np.float64)
+
+        matrices = [_to_matrices(df_train, df_ideal)[0] for df_train in train_datasets.values()]
+        train = np.hstack(matrices)
+        train_sq = np.einsum('ij,ij->j', train, train)
+
+        squared_diffs = np.empty((train.shape[1], ideal.shape[1]))
+        for start in range(0, ideal.shape[1], block_size):
+            stop = start + block_size
+            cross = train.T @ ideal[:, start:stop]
+            squared_diffs[:, start:stop] = train_sq[:, None] - 2 * cross + ideal_sq[None, start:stop]
+
+        results = {}
+        offset = 0
+        for (name, df_train), matrix in zip(train_datasets.items(), matrices):
+            best_fits = {}
+            for idx, col_train in enumerate(df_train.columns[1:]):
+                row = offset + idx
+                if np.isnan(squared_diffs[row]).all():
+                    # Like calculate_least_square, functions with NaN squared differences are never selected
+                    best_fits[col_train] = {'best_fit_col_ideal': None, 'squared_diff': float('inf'), 'test_column': col_train}
+                    continue
+                tolerance = 1e-8 * (train_sq[row] + np.nanmax(ideal_sq))
+                near = np.flatnonzero(squared_diffs[row] <= np.nanmin(squared_diffs[row]) + tolerance)
+
+                diff = ideal[:, near] - train[:, row, None]
+                near_sse = np.einsum('ij,ij->j', diff, diff)
+                best = np.lexsort((near, near_sse))[0]
+
+                best_fits[col_train] = {
+                    'best_fit_col_ideal': ideal_columns[near[best]],
+                    'squared_diff': float(near_sse[best]),
+                    'test_column': col_train
+                }
+            results[name] = best_fits
+            offset += matrix.shape[1]
+
+        return results
+
+    except CustomError as e:
+        print("Custom Error:", e.message)
+        # Perform alternative actions or exit the program
+
+    except (TypeError, KeyError, IndexError) as e:
+        print("Standard Error:", e)
+        # Perform alternative actions or exit the program
+
+def verify_compact_precision(df_train, df_ideal):
+    """
+    Check that the compact float32 mode selects the same best fits as float64.
+
+    The check converts the datasets to float32 copies, so it needs memory for both versions.
+
+    Parameters:
+        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+
+    Returns:
+        dict: 'match' (bool) is True if all selections are identical, 'mismatches' maps training columns
+              to the float64 and float32 selections where they differ, and 'max_relative_error' is the
+              largest relative error of the selected squared differences.
+    """
+    exact = calculate_best_fits(df_train, df_ideal)
+    compact = calculate_best_fits(
+        df_train.astype({column: np.float32 for column in df_train.columns[1:]}),
+        df_ideal.astype({column: np.float32 for column in df_ideal.columns[1:]}),
+        compact=True
+    )
+
+    mismatches = {}
+    max_relative_error = 0.0
+    for col_train, fit_info in exact.items():
+        if fit_info['best_fit_col_ideal'] != compact[col_train]['best_fit_col_ideal']:
+            mismatches[col_train] = {
+                'float64': fit_info['best_fit_col_ideal'],
+                'float32': compact[col_train]['best_fit_col_ideal']
+            }
+        error = abs(fit_info['squared_diff'] - compact[col_train]['squared_diff'])
+        if fit_info['squared_diff'] > 0:
+            error /= fit_info['squared_diff']
+        max_relative_error = max(max_relative_error, error)
+
+    return {'match': not mismatches, 'mismatches': mismatches, 'max_relative_error': max_relative_error}
+
+def _rank_candidates(squared_diffs, k):
+    """
+    Select the k smallest squared differences with a partial sort.
+
+    Parameters:
+        squared_diffs (np.ndarray): Squared differences of one training column to all ideal columns.
+        k (int): Number of candidates to keep.
+
+    Returns:
+        np.ndarray: Indices of the k best ideal columns, best first. Ties keep the column order.
+                    NaN values are never selected, so fewer than k indices are returned if there
+                    are fewer than k other values.
+    """
+    candidates = np.flatnonzero(~np.isnan(squared_diffs))
+    if k < len(candidates):
+        # argpartition keeps an arbitrary member of a tied group at the boundary, so all columns
+        # up to the k-th smallest value are kept and the tie is resolved by the sort below
+        values = squared_diffs[candidates]
+        kth = values[np.argpartition(values, k - 1)[k - 1]]
+        candidates = candidates[values <= kth]
+    return candidates[np.lexsort((candidates, squared_diffs[candidates]))][:k]
+
+def calculate_top_k(df_train, df_ideal, k=3):
+    """
+    Calculate the k best fitting ideal functions and their fit-quality metrics for each Y-column in the training dataset.
+
+    All metrics are computed in the same vectorized pass over the ideal dataset:
+    the sum of squared differences, the maximum absolute deviation, the root mean squared error
+    and the coefficient of determination R² of the ideal function as a predictor of the training data.
+
+    Parameters:
+        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        k (int): Number of ranked candidates to keep per training column. Default is 3.
+
+    Returns:
+        dict: A dictionary in the format of calculate_least_square for each Y-column in the training dataset,
+              extended by the metrics of the best fit and a ranked list 'candidates' with the metrics of the k best fits.
+    """
+    try:
+        if not isinstance(df_train, pd.DataFrame) or not isinstance(df_ideal, pd.DataFrame):
+            raise CustomError("DataFrames df_train and df_ideal must be of type pd.DataFrame")
+        if k < 1:
+            raise CustomError("k must be at least 1")
+
+        train, ideal = _to_matrices(df_train, df_ideal)
+        ideal_columns = df_ideal.columns[1:]
+        n_rows = len(train)
+
+        best_fits = {}
+        for idx, col_train in enumerate(df_train.columns[1:]):
+            diff = ideal - train[:, idx, None]
+            squared_diffs = np.einsum('ij,ij->j', diff, diff)
+            max_deviations = np.abs(diff).max(axis=0)
+            rmse = np.sqrt(squared_diffs / n_rows)
+            total_sum_squares = np.sum((train[:, idx] - train[:, idx].mean()) ** 2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                r_squared = 1 - squared_diffs / total_sum_squares
+
+            candidates = [
+                {
+                    'ideal_column': ideal_columns[j],
+                    'squared_diff': float(squared_diffs[j]),
+                    'max_deviation': float(max_deviations[j]),
+                    'rmse': float(rmse[j]),
+                    'r_squared': float(r_squared[j])
+                }
+                for j in _rank_candidates(squared_diffs, k)
+            ]
+
+            # Like calculate_least_square, no function is selected if all squared differences are NaN
+            best = candidates[0] if candidates else {
+                'ideal_column': None,
+                'squared_diff': float('inf'),
+                'max_deviation': float('inf'),
+                'rmse': float('inf'),
+                'r_squared': float('nan')
+            }
+            best_fits[col_train] = {
+                'best_fit_col_ideal': best['ideal_column'],
+                'squared_diff': best['squared_diff'],
+                'test_column': col_train,
+                'max_deviation': best['max_deviation'],
+                'rmse': best['rmse'],
+                'r_squared': best['r_squared'],
+                'candidates': candidates
+            }
+
+        return best_fits
+
+    except CustomError as e:
+        print("Custom Error:", e.message)
+        # Perform alternative actions or exit the program
+
+    except (TypeError, KeyError, IndexError) as e:
+        print("Standard Error:", e)
+        # Perform alternative actions or exit the program
+
+def _map_test_points(df_ideal, df_test, ideal_column):
+    """
+    Map the test points onto a single ideal function.
+
+    Parameters:
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        df_test (pd.DataFrame): Test dataset with the columns 'x' and 'y'.
+        ideal_column (str): Name of the ideal function in df_ideal.
+
+    Returns:
+        pd.DataFrame: Table with the test points sorted by x, the ideal Y-values, their distances and results.
+    """
+    # Sort the test dataset in ascending order by the X column
+    df_test_sorted = df_test.sort_values(by='x', ascending=True).reset_index(drop=True)
+
+    # Adjust Y-values for both test and ideal functions
+    adjusted_ideal_y = df_ideal.set_index('x').loc[df_test_sorted['x'], ideal_column].reset_index(drop=True)
+    adjusted_test_y = df_test_sorted['y'].reset_index(drop=True)
+
+    # Calculate distances between corresponding points in ideal and adjusted test datasets
+    distances = np.abs(adjusted_ideal_y - adjusted_test_y)
+
+    # Check if distance is less than square root of 2
+    results = distances < np.sqrt(2)
+
+    table_data = {
+        'x': df_test_sorted['x'],
+        'ideal_y': adjusted_ideal_y,
+        'test_y': adjusted_test_y,
+        'distance': distances,
+        'result': results,
+        'ideal_function_number': ideal_column.split('_')[-1]
+    }
+    return pd.DataFrame(table_data)
+
 def generate_individual_tables(df_ideal, df_test, best_fits, output_dir='./'):
     """
     Generate individual tables for each Y-column in the ideal dataset and the test data and save them as CSV files.
@@ -72,31 +808,9 @@ def generate_individual_tables(df_ideal, df_test, best_fits, output_dir='./'):
         # Loop through each Y-column in the best fits dictionary
         for column, fit_info in best_fits.items():
             ideal_column = fit_info['best_fit_col_ideal']
-            
-            # Sort the test dataset in ascending order by the X column
-            df_test_sorted = df_test.sort_values(by='x', ascending=True).reset_index(drop=True)
-            
-            # Adjust Y-values for both test and ideal functions
-            adjusted_ideal_y = df_ideal.set_index('x').loc[df_test_sorted['x'], ideal_column].reset_index(drop=True)
-            adjusted_test_y = df_test_sorted['y'].reset_index(drop=True)
-            
-            # Calculate distances between corresponding points in ideal and adjusted test datasets
-            distances = np.abs(adjusted_ideal_y - adjusted_test_y)
-            
-            # Check if distance is less than square root of 2
-            results = distances < np.sqrt(2)
-            
+
             # Create individual table for the Y-column
-            table_data = {
-                'x': df_test_sorted['x'],
-                'ideal_y': adjusted_ideal_y,
-                'test_y': adjusted_test_y,
-                'distance': distances,
-                'result': results,
-                'ideal_function_number': ideal_column.split('_')[-1]
-            }
-            
-            individual_tables[column] = pd.DataFrame(table_data)
+            individual_tables[column] = _map_test_points(df_ideal, df_test, ideal_column)
             
             # Include the Y-value of the ideal function in the table header
             print(f"Table for Ideal Y-column '{ideal_column}'")
@@ -124,6 +838,60 @@ def generate_individual_tables(df_ideal, df_test, best_fits, output_dir='./'):
         print("Unexpected Error:", e)
         # Perform alternative actions or exit the program
 
+def update_individual_tables(individual_tables, df_ideal, df_new_test, best_fits, output_dir='./'):
+    """
+    Map newly appended test points and merge them into existing individual tables.
+
+    Test points are mapped independently of each other, so only the new rows have to be processed
+    as long as train and ideal data are unchanged. New train or ideal rows change the best fits and
+    require a full run of calculate_least_square and generate_individual_tables instead.
+
+    If the test file has been rewritten, BaseCSVLoader.process_new_rows returns its complete new content
+    with df_new_test.attrs['reloaded'] set to True. The tables are then rebuilt from df_new_test alone
+    instead of merging it into the stale tables.
+
+    Parameters:
+        individual_tables (dict): Individual tables as returned by generate_individual_tables.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        df_new_test (pd.DataFrame): The newly ingested test rows with the columns 'x' and 'y'.
+        best_fits (dict): Dictionary containing the best fit in the ideal dataset for each Y-column
+                          in the training dataset.
+        output_dir (str): Directory path where the CSV files will be saved. Default is the current directory.
+
+    Returns:
+        dict: The updated individual tables. Only the True points files of the affected tables are rewritten.
+    """
+    try:
+        if not isinstance(df_ideal, pd.DataFrame) or not isinstance(df_new_test, pd.DataFrame):
+            raise CustomError("DataFrames df_ideal and df_new_test must be of type pd.DataFrame")
+
+        reloaded = df_new_test.attrs.get('reloaded', False)
+        if df_new_test.empty and not reloaded:
+            return individual_tables
+
+        updated_tables = {}
+        for column, fit_info in best_fits.items():
+            ideal_column = fit_info['best_fit_col_ideal']
+            new_table = _map_test_points(df_ideal, df_new_test, ideal_column)
+
+            # Keep the tables sorted by x, like a full run would
+            table = new_table if reloaded else pd.concat([individual_tables[column], new_table], ignore_index=True)
+            updated_tables[column] = table.sort_values(by='x', kind='stable').reset_index(drop=True)
+
+            true_table = updated_tables[column][updated_tables[column]['result'] == True]
+            true_table.to_csv(f"{output_dir}/True_Points_{ideal_column}.csv", index=False)
+            print(f"{len(new_table)} new test points mapped onto Ideal Y-column '{ideal_column}'")
+
+        return updated_tables
+
+    except CustomError as e:
+        print("Custom Error:", e.message)
+        # Perform alternative actions or exit the program
+
+    except (TypeError, KeyError, IndexError) as e:
+        print("Standard Error:", e)
+        # Perform alternative actions or exit the program
+
 def main():
     """
     Main function to demonstrate the usage of the calculate_least_square and generate_individual_tables functions.
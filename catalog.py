@@ -0,0 +1,76 @@
+import hashlib
+import numpy as np
+
+def _column_fingerprint(values, tolerance):
+    """
+    Compute a hash of a column that is equal for columns identical within the tolerance.
+
+    Parameters:
+        values (np.ndarray): The values of the column.
+        tolerance (float): Quantization step. 0 compares the exact values.
+
+    Returns:
+        str: The hexadecimal hash.
+    """
+    if tolerance > 0:
+        values = np.round(values / tolerance)
+    # All NaN values hash the same, regardless of their bit pattern
+    values = np.where(np.isnan(values), np.inf, values) + 0.0
+    return hashlib.sha1(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()
+
+def compact_catalog(df_ideal, tolerance=0.0):
+    """
+    Remove duplicate functions from the ideal dataset.
+
+    Columns are grouped by a hash of their values quantized to multiples of the tolerance, so columns
+    in the same group differ by less than the tolerance in every row. Near-identical columns whose
+    values fall on different sides of a quantization step are conservatively kept apart. The first
+    column of each group is kept as its representative.
+
+    With a tolerance of 0, only exact duplicates are merged. They have the same squared difference
+    and the searches keep the first of equal fits, so no selection changes. With a tolerance above 0
+    the compaction is approximate: a merged column can fit a training column better than its
+    representative, so both the selection and the reported squared difference can change. The square
+    root of the squared difference of a merged column differs from that of its representative by at
+    most tolerance * sqrt(number of rows).
+
+    Parameters:
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        tolerance (float): Maximum difference of equivalent columns. Default is 0, exact duplicates only,
+                           which keeps the selections exact.
+
+    Returns:
+        tuple: The ideal dataset with the representative columns only, and a dictionary mapping
+               each representative to the names of all equivalent columns, itself included.
+    """
+    if tolerance < 0:
+        raise ValueError("tolerance must not be negative")
+
+    values = df_ideal.iloc[:, 1:].to_numpy(dtype=np.float64)
+    equivalents = {}
+    representatives = {}
+    for idx, column in enumerate(df_ideal.columns[1:]):
+        fingerprint = _column_fingerprint(values[:, idx], tolerance)
+        if fingerprint not in representatives:
+            representatives[fingerprint] = column
+            equivalents[column] = []
+        equivalents[representatives[fingerprint]].append(column)
+
+    df_unique = df_ideal[[df_ideal.columns[0]] + list(equivalents)]
+    return df_unique, equivalents
+
+def expand_best_fits(best_fits, equivalents):
+    """
+    Map best fits computed on a compacted catalog back to all equivalent functions.
+
+    Parameters:
+        best_fits (dict): Dictionary containing the best fit in the compacted ideal dataset for each Y-column.
+        equivalents (dict): The equivalent columns per representative as returned by compact_catalog.
+
+    Returns:
+        dict: The best fits, each extended by the list 'equivalent_columns'.
+    """
+    for fit_info in best_fits.values():
+        representative = fit_info['best_fit_col_ideal']
+        fit_info['equivalent_columns'] = list(equivalents.get(representative, [representative]))
+    return best_fits
@@ -1,6 +1,12 @@
 import csv
-from sqlalchemy import create_engine, Table, Column, Float, MetaData, select
+import hashlib
+import os
+import sqlite3
+import urllib.parse
+from sqlalchemy import create_engine, Table, Column, Float, Integer, String, MetaData, select, func, and_, inspect
+import numpy as np
 import pandas as pd
+from catalog import compact_catalog
 
 class BaseCSVLoader:
     """
@@ -176,26 +182,47 @@ class BaseCSVLoader:
         engine: The database engine for connecting to the SQLite database.
         conn: The database connection.
         metadata: Metadata for the database.
+        state_table: The SQLAlchemy table holding the ingestion high-water mark per source file.
+        read_only (bool): True if the database is opened read-only.
+        query_chunk_size (int): Maximum number of x values bound into a single IN (...) query.
+        mmap_size (int): Number of bytes of the database file read through memory-mapped I/O in read-only mode.
 
     Methods:
         create_table: Method for creating the database table. Must be implemented in subclasses.
+        create_index: Method for creating the index on the 'x' column.
+        enable_wal: Method for switching the database to write-ahead logging.
         process_data: Method for processing and loading data from a CSV file into the database table.
+        process_new_rows: Method for loading only the rows appended to a CSV file since the last run.
         extract_values: Method for extracting values from a row of the CSV file.
         load_dataframe: Method for loading the CSV data into a Pandas DataFrame.
+        query_points: Method for fetching the rows for a batch of x values.
+        query_range: Method for fetching the rows inside an x-window.
     """
-    def __init__(self, database_file, table_name):
+    # SQLite limits the number of bound parameters per statement
+    query_chunk_size = 500
+    mmap_size = 256 * 1024 * 1024
+
+    def __init__(self, database_file, table_name, read_only=False):
         """
         Initializes the BaseCSVLoader class.
 
         Parameters:
             database_file (str): The file path to the SQLite database.
             table_name (str): The name of the table to load the data into.
+            read_only (bool): If True, the database is opened read-only with memory-mapped I/O and the
+                              tables are neither checked nor created, so many processes can read the
+                              same database without lock contention. The tables must already exist.
+                              Default is False.
         """
         self.database_file = database_file
         self.table_name = table_name
+        self.read_only = read_only
 
         # Establish a connection to the SQLite database
-        self.engine = create_engine(f'sqlite:///{self.database_file}')
+        if read_only:
+            self.engine = create_engine('sqlite://', creator=self._connect_read_only)
+        else:
+            self.engine = create_engine(f'sqlite:///{self.database_file}')
         self.conn = self.engine.connect()
 
         # Create metadata
@@ -203,12 +230,27 @@ class BaseCSVLoader:
 
         # Define the table
         self.create_table()
+        self.state_table = Table(
+            'ingest_state', self.metadata,
+            Column('source', String, primary_key=True),
+            Column('table_name', String, primary_key=True),
+            Column('byte_offset', Integer),
+            Column('row_count', Integer),
+            Column('prefix_hash', String)
+        )
+
+        # Readers rely on the tables created by a writer, the DDL checks would only cost round trips
+        if read_only:
+            return
 
         # Create the table in the database if it doesn't exist
         if not self.engine.dialect.has_table(self.engine, self.table_name):
             self.metadata.create_all()
             print(f"The '{self.table_name}' table has been created.")
 
+        # Tables created by older versions have no index on 'x'
+        self.create_index()
+
     def create_table(self):
         """
         Abstract method for creating the database table.
@@ -216,16 +258,68 @@ class BaseCSVLoader:
         """
         raise NotImplementedError("create_table method must be implemented in subclasses")
 
-    def process_data(self, csv_file):
+    def create_index(self):
+        """
+        Creates the index on the 'x' column if it doesn't exist yet.
+        """
+        self.conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{self.table_name}_x" ON "{self.table_name}" (x)')
+
+    def enable_wal(self):
+        """
+        Switches the database to write-ahead logging. The setting is stored in the database file.
+
+        In WAL mode, read-only loaders keep reading while a writer appends new rows, and readers
+        never block each other.
+
+        Raises:
+            ValueError: If the loader is read-only.
+        """
+        self._check_writable()
+        with self.engine.connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+
+    def _connect_read_only(self):
+        """
+        Opens a read-only connection with memory-mapped I/O.
+
+        Returns:
+            sqlite3.Connection: The connection.
+        """
+        path = urllib.parse.quote(os.path.abspath(self.database_file))
+        connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        connection.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        connection.execute('PRAGMA query_only=ON')
+        return connection
+
+    def _check_writable(self):
+        """
+        Raises an error if the loader is read-only.
+
+        Raises:
+            ValueError: If the loader is read-only.
+        """
+        if self.read_only:
+            raise ValueError(f"The '{self.table_name}' loader is read-only")
+
+    def process_data(self, csv_file, incremental=False):
         """
         Processes and loads data from a CSV file into the database table.
 
         Parameters:
             csv_file (str): The file path to the CSV file.
+            incremental (bool): If True, only the rows appended since the last run are loaded.
+                                See process_new_rows.
+
+        Returns:
+            pd.DataFrame: The newly loaded rows if incremental is True, otherwise None.
 
         Raises:
-            ValueError: If the CSV file is empty.
+            ValueError: If the CSV file is empty or the loader is read-only.
         """
+        self._check_writable()
+        if incremental:
+            return self.process_new_rows(csv_file)
+
         # Check if the table already contains data
         query = select([self.data_table])
         result = self.conn.execute(query)
@@ -249,6 +343,124 @@ class BaseCSVLoader:
         # Close the database connection
         self.conn.close()
 
+    def process_new_rows(self, csv_file):
+        """
+        Loads only the rows appended to a CSV file since the last run.
+
+        The byte offset, row count and a hash of the file content up to the offset are stored per
+        source file and table in the 'ingest_state' table. Tables that were filled before the state
+        was tracked are assumed to hold the first rows of the file. A trailing line without newline
+        is treated as still being written and is picked up by the next run. If the file became
+        shorter than the stored offset or the content up to the offset has changed, it has been
+        rewritten and the table is reloaded completely.
+
+        Parameters:
+            csv_file (str): The file path to the CSV file.
+
+        Returns:
+            pd.DataFrame: The newly loaded rows with the column names of the CSV header. Its attrs hold
+                          'reloaded', True if the file has been rewritten and the rows are the complete
+                          new content, and 'start_row', the number of rows of the table before the new rows.
+                          Downstream results derived from the old content must be rebuilt if 'reloaded' is True.
+
+        Raises:
+            ValueError: If the CSV file is empty or the loader is read-only.
+        """
+        self._check_writable()
+        self._create_state_table()
+        source = os.path.abspath(csv_file)
+        state_filter = and_(self.state_table.c.source == source, self.state_table.c.table_name == self.table_name)
+
+        with self.engine.begin() as conn, open(csv_file, 'rb') as file:
+            header_line = file.readline()
+            if not header_line:
+                raise ValueError("CSV file is empty")
+            header = next(csv.reader([header_line.decode()]))
+
+            state = conn.execute(select([self.state_table]).where(state_filter)).fetchone()
+            rewritten = False
+            if state is None:
+                # Skip the rows loaded before the high-water mark was tracked
+                row_count = conn.execute(select([func.count()]).select_from(self.data_table)).scalar()
+                for _ in range(row_count):
+                    file.readline()
+                digest = self._hash_prefix(file, file.tell())
+            elif state.byte_offset > os.path.getsize(csv_file):
+                rewritten = True
+            else:
+                row_count = state.row_count
+                digest = self._hash_prefix(file, state.byte_offset)
+                # States stored before the hash was tracked only have the offset
+                rewritten = state.prefix_hash is not None and digest.hexdigest() != state.prefix_hash
+
+            if rewritten:
+                print(f"\nThe CSV file '{csv_file}' has been rewritten, reloading the '{self.table_name}' table.")
+                conn.execute(self.data_table.delete())
+                row_count = 0
+                digest = self._hash_prefix(file, len(header_line))
+
+            # Read complete lines only
+            lines = []
+            byte_offset = file.tell()
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                lines.append(line.decode())
+                digest.update(line)
+                byte_offset += len(line)
+
+            new_values = [self.extract_values(row) for row in csv.reader(lines) if row]
+            if new_values:
+                conn.execute(self.data_table.insert(), new_values)
+
+            conn.execute(self.state_table.delete().where(state_filter))
+            conn.execute(self.state_table.insert().values(
+                source=source, table_name=self.table_name,
+                byte_offset=byte_offset, row_count=row_count + len(new_values),
+                prefix_hash=digest.hexdigest()
+            ))
+
+        print(f"{len(new_values)} new rows have been loaded from the CSV file into the '{self.table_name}' table.")
+        new_rows = pd.DataFrame(new_values, columns=[column.name for column in self.data_table.columns])
+        new_rows.columns = header
+        new_rows.attrs['reloaded'] = rewritten
+        new_rows.attrs['start_row'] = row_count
+        return new_rows
+
+    def _create_state_table(self):
+        """
+        Creates the 'ingest_state' table if it doesn't exist and adds columns missing in older versions.
+        """
+        self.state_table.create(checkfirst=True)
+        existing = [column['name'] for column in inspect(self.engine).get_columns(self.state_table.name)]
+        if 'prefix_hash' not in existing:
+            with self.engine.connect() as conn:
+                conn.execute(f'ALTER TABLE "{self.state_table.name}" ADD COLUMN prefix_hash VARCHAR')
+
+    @staticmethod
+    def _hash_prefix(file, byte_offset, chunk_size=1 << 20):
+        """
+        Hashes the first bytes of a file and leaves the file positioned after them.
+
+        Parameters:
+            file: The file opened in binary mode.
+            byte_offset (int): Number of bytes to hash.
+            chunk_size (int): Number of bytes read at once. Default is 1 MiB.
+
+        Returns:
+            hashlib.sha256: The digest, which can be updated with the following content.
+        """
+        digest = hashlib.sha256()
+        file.seek(0)
+        remaining = byte_offset
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+        return digest
+
     def extract_values(self):
         """
         Abstract method for extracting values from a row of the CSV file.
@@ -256,18 +468,81 @@ class BaseCSVLoader:
         """
         raise NotImplementedError("extract_values method must be implemented in subclasses")
 
-    def load_dataframe(self, csv_filename):
+    def load_dataframe(self, csv_filename, compact=False):
         """
         Loads the CSV data into a Pandas DataFrame.
 
         Parameters:
             csv_filename (str): The file path to the CSV file.
+            compact (bool): If True, the Y-columns are loaded as float32, which halves their memory footprint.
+                            The 'x' column stays float64 for exact lookups by x. Default is False.
 
         Returns:
             pd.DataFrame: The loaded Pandas DataFrame.
         """
+        if compact:
+            header = pd.read_csv(csv_filename, nrows=0).columns
+            return pd.read_csv(csv_filename, dtype={column: 'float32' for column in header[1:]})
         return pd.read_csv(csv_filename)
 
+    def query_points(self, x_values, columns=None):
+        """
+        Fetches the rows for a batch of x values using the index on the 'x' column.
+
+        Parameters:
+            x_values (iterable): The x values to look up.
+            columns (list): Names of the Y-columns to fetch. Default is all columns.
+
+        Returns:
+            pd.DataFrame: The matching rows sorted by x. x values without a matching row are omitted.
+        """
+        x_values = sorted(set(float(x) for x in x_values))
+        selected = self._select_columns(columns)
+        rows = []
+
+        with self.engine.connect() as conn:
+            # The chunks are sorted and disjoint, so the concatenated result stays sorted by x
+            for start in range(0, len(x_values), self.query_chunk_size):
+                chunk = x_values[start:start + self.query_chunk_size]
+                query = select(selected).where(self.data_table.c.x.in_(chunk)).order_by(self.data_table.c.x)
+                rows.extend(tuple(row) for row in conn.execute(query))
+
+        return pd.DataFrame(rows, columns=[column.name for column in selected])
+
+    def query_range(self, x_min, x_max, columns=None):
+        """
+        Fetches all rows with x_min <= x <= x_max using the index on the 'x' column.
+
+        Parameters:
+            x_min (float): Lower bound of the x-window (inclusive).
+            x_max (float): Upper bound of the x-window (inclusive).
+            columns (list): Names of the Y-columns to fetch. Default is all columns.
+
+        Returns:
+            pd.DataFrame: The matching rows sorted by x.
+        """
+        selected = self._select_columns(columns)
+        query = select(selected).where(self.data_table.c.x.between(x_min, x_max)).order_by(self.data_table.c.x)
+
+        with self.engine.connect() as conn:
+            rows = [tuple(row) for row in conn.execute(query)]
+
+        return pd.DataFrame(rows, columns=[column.name for column in selected])
+
+    def _select_columns(self, columns):
+        """
+        Resolves column names to table columns. The 'x' column is always selected first.
+
+        Parameters:
+            columns (list): Names of the Y-columns, or None for all columns.
+
+        Returns:
+            list: The SQLAlchemy columns to select.
+        """
+        if columns is None:
+            return list(self.data_table.columns)
+        return [self.data_table.c.x] + [self.data_table.c[name] for name in columns if name != 'x']
+
 class CSVLoader1(BaseCSVLoader):
     """
     Subclass of BaseCSVLoader for specific CSV files with five columns.
@@ -283,7 +558,7 @@ class CSVLoader1(BaseCSVLoader):
         """
         Creates the database table with five columns (x, y1, y2, y3, y4).
         """
-        columns = [Column('x', Float), Column('y1', Float), Column('y2', Float), Column('y3', Float), Column('y4', Float)]
+        columns = [Column('x', Float, index=True), Column('y1', Float), Column('y2', Float), Column('y3', Float), Column('y4', Float)]
         self.data_table = Table(self.table_name, self.metadata, *columns)
 
     def extract_values(self, row):
@@ -321,7 +596,7 @@ class CSVLoader2(BaseCSVLoader):
         """
         Creates the database table with two columns (x, y1).
         """
-        columns = [Column('x', Float), Column('y1', Float)]
+        columns = [Column('x', Float, index=True), Column('y1', Float)]
         self.data_table = Table(self.table_name, self.metadata, *columns)
 
     def extract_values(self, row):
@@ -345,20 +620,78 @@ class CSVLoader3(BaseCSVLoader):
     """
     Subclass of BaseCSVLoader for specific CSV files with 51 columns.
 
+    The ingestion also maintains a sidecar table '<table_name>_stats' with per-function statistics,
+    so the fitting stages don't have to recompute them on every run. The statistics store the hash
+    of the CSV file the table was loaded from, so they can be checked against a newer version of it.
+
     Attributes:
         data_table: The SQLAlchemy table for the data.
+        stats_table: The SQLAlchemy table for the per-function statistics.
 
     Methods:
-        create_table: Method for creating the database table.
+        create_table: Method for creating the database tables.
+        process_data: Method for loading the CSV file and updating the statistics.
         extract_values: Method for extracting values from a row of the CSV file.
+        update_statistics: Method for recomputing the per-function statistics.
+        column_stats: Method for reading the per-function statistics.
+        load_catalog: Method for loading the CSV data without duplicate functions.
     """
     def create_table(self):
         """
         Creates the database table with 51 columns (x, y1, y2, ..., y50).
         """
-        columns = [Column('x', Float)]
+        columns = [Column('x', Float, index=True)]
         columns += [Column(f'y{i}', Float) for i in range(1, 51)]  # Create 50 y-attributes
         self.data_table = Table(self.table_name, self.metadata, *columns)
+        self.stats_table = Table(
+            f'{self.table_name}_stats', self.metadata,
+            Column('function', String, primary_key=True),
+            Column('n_rows', Integer),
+            Column('sum', Float),
+            Column('sum_sq', Float),
+            Column('min', Float),
+            Column('max', Float),
+            Column('source_hash', String)
+        )
+
+    def process_data(self, csv_file, incremental=False):
+        """
+        Processes and loads data from a CSV file into the database table and updates the statistics.
+
+        The statistics are only recomputed if rows have been loaded or they are out of date, so a
+        run on an unchanged table doesn't write to the database. Statistics of a table loaded before
+        the source was tracked get the hash of the CSV file if it has as many rows as the table.
+
+        Parameters:
+            csv_file (str): The file path to the CSV file.
+            incremental (bool): If True, only the rows appended since the last run are loaded.
+
+        Returns:
+            pd.DataFrame: The newly loaded rows if incremental is True, otherwise None.
+        """
+        self._check_writable()
+        with self.engine.connect() as conn:
+            was_empty = conn.execute(select([func.count()]).select_from(self.data_table)).scalar() == 0
+        new_rows = super().process_data(csv_file, incremental)
+
+        loaded = not new_rows.empty if incremental else was_empty
+        if loaded:
+            self.update_statistics(csv_file)
+            return new_rows
+
+        stats, n_rows = self._stored_statistics()
+        source_hash = next(iter(stats.values()))['source_hash'] if stats is not None else None
+        if source_hash is None:
+            # The table was loaded before the source was tracked, the CSV file is taken as its source
+            # if it has as many rows as the table
+            if n_rows == self._count_rows(csv_file):
+                self.update_statistics(csv_file)
+            elif stats is None:
+                self.update_statistics()
+        elif source_hash != self._source_hash(csv_file):
+            print(f"\nThe CSV file '{csv_file}' has changed since the '{self.table_name}' table was loaded, "
+                  "reload it with process_data(csv_file, incremental=True).")
+        return new_rows
 
     def extract_values(self, row):
         """
@@ -377,8 +710,184 @@ class CSVLoader3(BaseCSVLoader):
             values[f'y{i}'] = float(row[i])
         return values
 
-    
+    def load_catalog(self, csv_filename, tolerance=0.0, compact=False):
+        """
+        Loads the CSV data into a Pandas DataFrame and removes duplicate functions.
 
+        Parameters:
+            csv_filename (str): The file path to the CSV file.
+            tolerance (float): Maximum difference of equivalent functions. Default is 0, exact duplicates only.
+                               Above 0 the compaction is approximate, see catalog.compact_catalog.
+            compact (bool): If True, the Y-columns are loaded as float32. Default is False.
+
+        Returns:
+            tuple: The DataFrame with unique functions only and the equivalent functions per
+                   representative, see catalog.compact_catalog.
+        """
+        df_unique, equivalents = compact_catalog(self.load_dataframe(csv_filename), tolerance)
+        duplicates = sum(len(columns) - 1 for columns in equivalents.values())
+        if duplicates:
+            print(f"{duplicates} duplicate functions have been removed from the '{self.table_name}' catalog.")
+        if compact:
+            df_unique = df_unique.astype({column: 'float32' for column in df_unique.columns[1:]})
+        return df_unique, equivalents
+
+    def update_statistics(self, csv_file=None):
+        """
+        Recomputes the per-function statistics with a single aggregate query over the table.
+
+        Parameters:
+            csv_file (str): The CSV file the table has been loaded from. Its hash is stored with the
+                            statistics. Default is None, the source is unknown.
 
+        Raises:
+            ValueError: If the loader is read-only.
+        """
+        self._check_writable()
+        source_hash = self._source_hash(csv_file) if csv_file is not None else None
+
+        # The statistics are derived data, tables of older versions are simply replaced
+        self.stats_table.drop(checkfirst=True)
+        self.stats_table.create()
+        with self.engine.begin() as conn:
+            rows = self._aggregate_statistics(conn)
+            for row in rows:
+                row['source_hash'] = source_hash
+            conn.execute(self.stats_table.insert(), rows)
+
+    def _source_hash(self, csv_file):
+        """
+        Computes the SHA-256 hash of a CSV file.
 
+        Parameters:
+            csv_file (str): The file path to the CSV file.
 
+        Returns:
+            str: The hexadecimal hash.
+        """
+        with open(csv_file, 'rb') as file:
+            return self._hash_prefix(file, os.path.getsize(csv_file)).hexdigest()
+
+    @staticmethod
+    def _count_rows(csv_file):
+        """
+        Counts the data rows of a CSV file.
+
+        Parameters:
+            csv_file (str): The file path to the CSV file.
+
+        Returns:
+            int: The number of non-empty rows after the header.
+        """
+        with open(csv_file, 'r') as file:
+            csv_data = csv.reader(file)
+            next(csv_data, None)
+            return sum(1 for row in csv_data if row)
+
+    def _stored_statistics(self):
+        """
+        Reads the stored per-function statistics if they are up to date.
+
+        Returns:
+            tuple: The statistics rows by function name, or None if they are missing or out of date,
+                   and the number of rows of the table.
+        """
+        functions = [column.name for column in self.data_table.columns][1:]
+
+        with self.engine.connect() as conn:
+            n_rows = conn.execute(select([func.count()]).select_from(self.data_table)).scalar()
+            if not self.engine.dialect.has_table(conn, self.stats_table.name):
+                return None, n_rows
+            existing = [column['name'] for column in inspect(conn).get_columns(self.stats_table.name)]
+            if 'source_hash' not in existing:
+                return None, n_rows
+            stats = {row['function']: row for row in conn.execute(select([self.stats_table]))}
+
+        if set(stats) != set(functions) or any(row['n_rows'] != n_rows for row in stats.values()):
+            return None, n_rows
+        return stats, n_rows
+
+    def _aggregate_statistics(self, conn):
+        """
+        Computes the per-function statistics with a single aggregate query over the table.
+
+        Parameters:
+            conn: The database connection.
+
+        Returns:
+            list: One dictionary per function with the columns of the statistics table.
+        """
+        functions = [column.name for column in self.data_table.columns][1:]
+        aggregates = [func.count()]
+        for name in functions:
+            column = self.data_table.c[name]
+            aggregates += [func.sum(column), func.sum(column * column), func.min(column), func.max(column)]
+
+        result = conn.execute(select(aggregates)).fetchone()
+        return [
+            {
+                'function': name,
+                'n_rows': result[0],
+                'sum': result[1 + 4 * idx],
+                'sum_sq': result[2 + 4 * idx],
+                'min': result[3 + 4 * idx],
+                'max': result[4 + 4 * idx]
+            }
+            for idx, name in enumerate(functions)
+        ]
+
+    def column_stats(self, csv_file=None):
+        """
+        Reads the per-function statistics in the column order of the table.
+
+        The statistics are recomputed if they are missing or the number of rows has changed since.
+        Read-only loaders compute them without storing them.
+
+        Parameters:
+            csv_file (str): If given, the statistics are only returned if the table has been loaded
+                            from this version of the CSV file. Default is None, no check.
+
+        Returns:
+            dict: 'columns' (list of function names), 'n_rows' (int) and the arrays 'sums', 'sum_sq',
+                  'norms', 'means', 'min' and 'max' with one value per function, plus the sorted x grid 'x'
+                  and the 'source_hash' of the CSV file (None if unknown).
+                  'norms' and 'means' can be passed to calculate.calculate_best_fits_pruned as ideal_stats.
+
+        Raises:
+            ValueError: If the table hasn't been loaded from the given version of the CSV file.
+        """
+        functions = [column.name for column in self.data_table.columns][1:]
+        stats, n_rows = self._stored_statistics()
+
+        if stats is None:
+            if not self.read_only:
+                self.update_statistics()
+                return self.column_stats(csv_file)
+            with self.engine.connect() as conn:
+                stats = {row['function']: dict(row, source_hash=None) for row in self._aggregate_statistics(conn)}
+
+        source_hash = stats[functions[0]]['source_hash']
+        if csv_file is not None and source_hash != self._source_hash(csv_file):
+            raise ValueError(
+                f"The '{self.table_name}' table hasn't been loaded from the current version of '{csv_file}', "
+                "reload it with process_data(csv_file, incremental=True)"
+            )
+
+        with self.engine.connect() as conn:
+            # The index on 'x' returns the grid sorted without touching the table rows
+            x = np.array([row[0] for row in conn.execute(select([self.data_table.c.x]).order_by(self.data_table.c.x))])
+
+        sums = np.array([stats[name]['sum'] for name in functions], dtype=float)
+        sum_sq = np.array([stats[name]['sum_sq'] for name in functions], dtype=float)
+        return {
+            'columns': functions,
+            'n_rows': n_rows,
+            'sums': sums,
+            'sum_sq': sum_sq,
+            'norms': np.sqrt(sum_sq),
+            'means': sums / n_rows if n_rows else np.full(len(functions), np.nan),
+            'min': np.array([stats[name]['min'] for name in functions], dtype=float),
+            'max': np.array([stats[name]['max'] for name in functions], dtype=float),
+            'x': x,
+            'source_hash': source_hash
+        }
@@ -0,0 +1,229 @@
+import time
+import numpy as np
+import pandas as pd
+import calculate
+import kernels
+from fitstate import FitState
+from results import MappingResult
+from service import MappingModel
+
+def generate_datasets(seed, n_rows=400, n_train=4, n_ideal=50, n_test=100, ties=True, tie_size=3, nans=False, off_grid=False):
+    """
+    Generate randomized train, ideal and test datasets.
+
+    The ideal functions are random walks. Each training column is a noisy copy of a random ideal
+    function, and the test points lie on the x grid of the ideal dataset.
+
+    Parameters:
+        seed (int): Seed of the random number generator.
+        n_rows (int): Number of rows of the ideal dataset. Default is 400.
+        n_train (int): Number of Y-columns in the training dataset. Default is 4.
+        n_ideal (int): Number of Y-columns in the ideal dataset. Default is 50.
+        n_test (int): Number of test points. Default is 100.
+        ties (bool): If True, the ideal dataset contains exact duplicates of the fitted functions. Default is True.
+        tie_size (int): Number of duplicates of each fitted function. With the default of 3, each tied group
+                        has 4 members, more than the k=3 candidates ranked by the top-k backend.
+        nans (bool): If True, some ideal functions, possibly fitted ones, and one training column contain
+                     a NaN value. Default is False.
+        off_grid (bool): If True, the training data is sampled on a shifted, coarser x grid. Default is False.
+
+    Returns:
+        tuple: The train, ideal and test datasets.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.round(np.linspace(-20, 20, n_rows), 6)
+    ideal = rng.normal(size=(n_rows, n_ideal)).cumsum(axis=0) + rng.normal(scale=5, size=n_ideal)
+    targets = rng.integers(0, n_ideal, n_train)
+
+    if ties:
+        # Duplicate the fitted functions into random other columns
+        for target in targets:
+            ideal[:, rng.choice(n_ideal, size=min(tie_size, n_ideal), replace=False)] = ideal[:, [target]]
+    if nans:
+        for col in rng.choice(n_ideal, size=max(1, n_ideal // 10), replace=False):
+            ideal[rng.integers(0, n_rows), col] = np.nan
+
+    df_ideal = pd.DataFrame(ideal, columns=[f'y{i}' for i in range(1, n_ideal + 1)])
+    df_ideal.insert(0, 'x', x)
+
+    train = ideal[:, targets] + rng.normal(scale=0.3, size=(n_rows, n_train))
+    if nans:
+        train[rng.integers(0, n_rows), rng.integers(0, n_train)] = np.nan
+    df_train = pd.DataFrame(train, columns=[f'y{i}' for i in range(1, n_train + 1)])
+    df_train.insert(0, 'x', x)
+    if off_grid:
+        df_train = df_train.iloc[::3].copy()
+        df_train['x'] = df_train['x'] + (x[1] - x[0]) / 2
+        df_train = df_train[df_train['x'] <= x[-1]].reset_index(drop=True)
+
+    rows = rng.integers(0, n_rows, n_test)
+    columns = rng.integers(0, n_ideal, n_test)
+    df_test = pd.DataFrame({
+        'x': x[rows],
+        'y': np.nan_to_num(ideal[rows, columns]) + rng.normal(scale=1.0, size=n_test)
+    })
+    return df_train, df_ideal, df_test
+
+def _batch(df_train, df_ideal):
+    return calculate.calculate_best_fits_batch({'train': df_train}, df_ideal, block_size=16)['train']
+
+def _backends():
+    """
+    Return the fitting backends by name, the reference implementation first.
+
+    Returns:
+        dict: Functions taking df_train and df_ideal and returning best fits.
+    """
+    backends = {
+        'reference': calculate.calculate_least_square,
+        'vectorized': lambda df_train, df_ideal: calculate.calculate_best_fits(df_train, df_ideal, backend='numpy'),
+        'chunked': _batch,
+        'pruned': lambda df_train, df_ideal: calculate.calculate_best_fits_pruned(df_train, df_ideal, row_block=16, candidate_block=8),
+        'multires': lambda df_train, df_ideal: calculate.calculate_best_fits_multires(df_train, df_ideal, stride=8, shortlist=5),
+        'top_k': lambda df_train, df_ideal: calculate.calculate_top_k(df_train, df_ideal, k=3),
+        'fit_state': lambda df_train, df_ideal: FitState.from_dataframes(df_train, df_ideal).best_fits()
+    }
+    if 'numba' in kernels.available_backends():
+        backends['parallel'] = lambda df_train, df_ideal: calculate.calculate_best_fits(df_train, df_ideal, backend='numba')
+    return backends
+
+def _service_tables(df_ideal, df_test, best_fits):
+    """
+    Map the test points with service.MappingModel and arrange them like generate_individual_tables.
+
+    Returns:
+        dict: One table per training column with a valid fit.
+    """
+    model = MappingModel(df_ideal, best_fits)
+    mapped = model.map_points(df_test['x'].to_numpy(dtype=float), df_test['y'].to_numpy(dtype=float))
+    tables = {}
+    for idx, (column, fit_info) in enumerate(model.best_fits.items()):
+        matches = [point['matches'][idx] for point in mapped]
+        tables[column] = pd.DataFrame({
+            'x': [point['x'] for point in mapped],
+            'ideal_y': [match['ideal_y'] for match in matches],
+            'test_y': [point['y'] for point in mapped],
+            'distance': [match['distance'] for match in matches],
+            'result': [match['result'] for match in matches],
+            'ideal_function_number': fit_info['best_fit_col_ideal'].split('_')[-1]
+        })
+    return tables
+
+def _incremental_tables(df_ideal, df_test, best_fits, output_dir):
+    """
+    Map the first half of the test points with generate_individual_tables and add the second half
+    with calculate.update_individual_tables.
+
+    Returns:
+        dict: One table per training column.
+    """
+    split = len(df_test) // 2
+    tables = calculate.generate_individual_tables(df_ideal, df_test.iloc[:split], best_fits, output_dir)
+    return calculate.update_individual_tables(tables, df_ideal, df_test.iloc[split:], best_fits, output_dir)
+
+def _same_points(table, expected_table):
+    """
+    Compare two mapping tables regardless of the order of test points with the same x value.
+
+    Returns:
+        bool: True if both tables contain the same mapped points.
+    """
+    if table is None or list(table.columns) != list(expected_table.columns):
+        return False
+    def canonical(df):
+        return df.sort_values(by=['x', 'test_y'], kind='stable').reset_index(drop=True)
+    return canonical(table).equals(canonical(expected_table))
+
+def run_equivalence(df_train, df_ideal, df_test, output_dir):
+    """
+    Run the reference implementation and all accelerated backends on the same datasets and compare them.
+
+    Training data on a different x grid is aligned onto the training grid with calculate.align_to_grid
+    first, so all backends, the reference included, see the same rows. The mapped points of
+    results.MappingResult, service.MappingModel and calculate.update_individual_tables are compared
+    with generate_individual_tables, the latter two regardless of the order of points with equal x.
+
+    Parameters:
+        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        df_test (pd.DataFrame): Test dataset with the columns 'x' and 'y'.
+        output_dir (str): Directory path for the True points files of the reference mapping.
+
+    Returns:
+        dict: 'timings' with the runtime in seconds per backend, and 'mismatches' with a description
+              of every best fit or mapped point that differs from the reference.
+    """
+    df_fit_ideal = df_ideal
+    if len(df_train) != len(df_ideal) or not np.array_equal(df_train['x'].to_numpy(), df_ideal['x'].to_numpy()):
+        df_train, df_fit_ideal = calculate.align_to_grid(df_train, df_ideal)
+
+    timings = {}
+    results = {}
+    for name, backend in _backends().items():
+        start = time.perf_counter()
+        results[name] = backend(df_train, df_fit_ideal)
+        timings[name] = time.perf_counter() - start
+
+    mismatches = []
+    expected = results['reference']
+    for name, best_fits in results.items():
+        if best_fits is None:
+            mismatches.append(f"{name}: no result")
+            continue
+        for col in expected:
+            if best_fits[col]['best_fit_col_ideal'] != expected[col]['best_fit_col_ideal']:
+                mismatches.append(
+                    f"{name}: best fit of '{col}' is '{best_fits[col]['best_fit_col_ideal']}', "
+                    f"expected '{expected[col]['best_fit_col_ideal']}'"
+                )
+
+    # Training columns without a valid fit, e.g. with NaN values, have no function to map onto
+    mapped_fits = {col: fit_info for col, fit_info in expected.items() if fit_info['best_fit_col_ideal'] is not None}
+
+    start = time.perf_counter()
+    expected_tables = calculate.generate_individual_tables(df_ideal, df_test, mapped_fits, output_dir)
+    timings['mapping_reference'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compact = MappingResult.from_test_data(df_ideal, df_test, mapped_fits)
+    tables = {column: compact[column] for column in compact}
+    timings['mapping_compact'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service_tables = _service_tables(df_ideal, df_test, expected)
+    timings['mapping_service'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    incremental_tables = _incremental_tables(df_ideal, df_test, mapped_fits, output_dir) or {}
+    timings['mapping_incremental'] = time.perf_counter() - start
+
+    for column, expected_table in expected_tables.items():
+        if not tables[column].equals(expected_table):
+            mismatches.append(f"mapping_compact: mapped points of '{column}' differ")
+        if not _same_points(service_tables.get(column), expected_table):
+            mismatches.append(f"mapping_service: mapped points of '{column}' differ")
+        if not _same_points(incremental_tables.get(column), expected_table):
+            mismatches.append(f"mapping_incremental: mapped points of '{column}' differ")
+
+    return {'timings': timings, 'mismatches': mismatches}
+
+def main():
+    """
+    Main function to run the equivalence harness on wide catalogs and print the runtime of each backend.
+    """
+    import contextlib
+    import io
+    import tempfile
+
+    for n_ideal in (50, 500, 2000):
+        df_train, df_ideal, df_test = generate_datasets(seed=n_ideal, n_ideal=n_ideal, nans=True)
+        with tempfile.TemporaryDirectory() as output_dir, contextlib.redirect_stdout(io.StringIO()):
+            report = run_equivalence(df_train, df_ideal, df_test, output_dir)
+        print(f"\n{n_ideal} ideal functions: {len(report['mismatches'])} mismatches")
+        for mismatch in report['mismatches']:
+            print(f"  {mismatch}")
+        for name, seconds in report['timings'].items():
+            print(f"  {name:<20} {seconds * 1000:10.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import os
+import warnings
+import numpy as np
+import kernels
+
+class FitState:
+    """
+    Persisted sufficient statistics for an incremental least-squares best-fit search.
+
+    The squared difference between a training column t and an ideal column i expands to
+    sum(t²) - 2 * sum(t * i) + sum(i²). Keeping these sums per pair allows appended training rows
+    to be added in O(new_rows x pairs) without rescanning the rows seen before.
+
+    Values with a large offset would make the three sums nearly cancel, so the sums are kept over
+    values shifted by a reference value per column, the column mean of the first update. With
+    a = t - ref_t, b = i - ref_i and d = ref_t - ref_i, the squared difference is
+    sum(a²) - 2 * sum(a * b) + sum(b²) + 2 * d * (sum(a) - sum(b)) + n * d².
+
+    Attributes:
+        train_columns (list): Names of the Y-columns in the training dataset.
+        ideal_columns (list): Names of the Y-columns in the ideal dataset.
+        n_rows (int): Number of training rows accumulated so far.
+        ref_train (np.ndarray): Reference value per training column.
+        ref_ideal (np.ndarray): Reference value per ideal column.
+        sum_train (np.ndarray): sum(a) per training column.
+        sum_ideal (np.ndarray): sum(b) per ideal column over the accumulated x values.
+        sum_train_sq (np.ndarray): sum(a²) per training column.
+        sum_ideal_sq (np.ndarray): sum(b²) per ideal column over the accumulated x values.
+        sum_cross (np.ndarray): sum(a * b) per pair of training and ideal column.
+
+    Methods:
+        from_dataframes: Method for creating a state from a complete training dataset.
+        reset: Method for discarding all accumulated rows.
+        update: Method for adding new training rows to the state.
+        squared_diffs: Method for computing the squared differences of all pairs.
+        best_fits: Method for computing the best fits in the format of calculate_least_square.
+        save: Method for saving the state to a file.
+        load: Method for loading a state from a file.
+    """
+    def __init__(self, train_columns, ideal_columns):
+        """
+        Initializes an empty FitState.
+
+        Parameters:
+            train_columns (list): Names of the Y-columns in the training dataset.
+            ideal_columns (list): Names of the Y-columns in the ideal dataset.
+        """
+        self.train_columns = list(train_columns)
+        self.ideal_columns = list(ideal_columns)
+        self.reset()
+
+    def reset(self):
+        """
+        Discards all accumulated rows and the reference values.
+        """
+        self.n_rows = 0
+        self.ref_train = np.zeros(len(self.train_columns))
+        self.ref_ideal = np.zeros(len(self.ideal_columns))
+        self.sum_train = np.zeros(len(self.train_columns))
+        self.sum_ideal = np.zeros(len(self.ideal_columns))
+        self.sum_train_sq = np.zeros(len(self.train_columns))
+        self.sum_ideal_sq = np.zeros(len(self.ideal_columns))
+        self.sum_cross = np.zeros((len(self.train_columns), len(self.ideal_columns)))
+
+    @classmethod
+    def from_dataframes(cls, df_train, df_ideal):
+        """
+        Creates a state from a complete training dataset.
+
+        Parameters:
+            df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+            df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+
+        Returns:
+            FitState: The state holding the sums over all rows of df_train.
+        """
+        state = cls(df_train.columns[1:], df_ideal.columns[1:])
+        state.update(df_train, df_ideal)
+        return state
+
+    def update(self, df_train_new, df_ideal, start_row=None):
+        """
+        Adds new training rows to the state.
+
+        The ideal values are looked up by the x values of the new rows. The position of the new rows
+        in the training dataset is checked against the number of rows accumulated so far, so rows that
+        are applied twice or rows of a rewritten file are never mixed into the sums.
+
+        Parameters:
+            df_train_new (pd.DataFrame): The new training rows with 'x' as the first column.
+            df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+            start_row (int): Number of training rows before the new rows. If 0, df_train_new holds the complete
+                             training dataset and the state is rebuilt from it. Default is
+                             df_train_new.attrs['start_row'] as set by BaseCSVLoader.process_new_rows,
+                             or no check if it's missing.
+
+        Raises:
+            ValueError: If the columns don't match the columns of the state, or start_row doesn't match
+                        the number of rows accumulated so far.
+            KeyError: If an x value of the new rows is missing in the ideal dataset.
+        """
+        if list(df_train_new.columns[1:]) != self.train_columns or list(df_ideal.columns[1:]) != self.ideal_columns:
+            raise ValueError("The columns of the DataFrames don't match the columns of the fit state")
+
+        if start_row is None:
+            start_row = df_train_new.attrs.get('start_row')
+        if start_row == 0:
+            self.reset()
+        elif start_row is not None and start_row != self.n_rows:
+            raise ValueError(
+                f"The new rows start at row {start_row}, but the fit state holds {self.n_rows} rows. "
+                "Rebuild the state from the complete training dataset with start_row=0."
+            )
+
+        train_rows = df_train_new[self.train_columns].to_numpy(dtype=float)
+        ideal_rows = df_ideal.set_index('x').loc[df_train_new['x'], self.ideal_columns].to_numpy(dtype=float)
+        if len(train_rows) == 0:
+            return
+
+        if self.n_rows == 0:
+            # Fix the reference values at the first update, columns without a valid value keep 0
+            with np.errstate(all='ignore'), warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self.ref_train = np.nan_to_num(np.nanmean(train_rows, axis=0))
+                self.ref_ideal = np.nan_to_num(np.nanmean(ideal_rows, axis=0))
+
+        train_rows = train_rows - self.ref_train
+        ideal_rows = ideal_rows - self.ref_ideal
+        self.sum_train += train_rows.sum(axis=0)
+        self.sum_ideal += ideal_rows.sum(axis=0)
+        self.sum_train_sq += np.einsum('ij,ij->j', train_rows, train_rows)
+        self.sum_ideal_sq += np.einsum('ij,ij->j', ideal_rows, ideal_rows)
+        self.sum_cross += train_rows.T @ ideal_rows
+        self.n_rows += len(train_rows)
+
+    def squared_diffs(self):
+        """
+        Computes the squared differences of all pairs from the accumulated sums.
+
+        Returns:
+            np.ndarray: Matrix of squared differences with one row per training column
+                        and one column per ideal column.
+        """
+        offsets = self.ref_train[:, None] - self.ref_ideal[None, :]
+        squared_diffs = (
+            self.sum_train_sq[:, None] - 2 * self.sum_cross + self.sum_ideal_sq[None, :]
+            + 2 * offsets * (self.sum_train[:, None] - self.sum_ideal[None, :])
+            + self.n_rows * offsets ** 2
+        )
+
+        # Rounding errors of the expansion can produce tiny negative values for exact fits
+        return np.maximum(squared_diffs, 0.0)
+
+    def best_fits(self):
+        """
+        Computes the best fit in the ideal dataset for each training column.
+
+        Returns:
+            dict: A dictionary in the format of calculate.calculate_least_square.
+        """
+        squared_diffs = self.squared_diffs()
+        best_fits = {}
+        for row, col_train in enumerate(self.train_columns):
+            best = kernels.best_index(squared_diffs[row])
+            if best < 0:
+                best_fits[col_train] = {'best_fit_col_ideal': None, 'squared_diff': float('inf'), 'test_column': col_train}
+                continue
+            best_fits[col_train] = {
+                'best_fit_col_ideal': self.ideal_columns[best],
+                'squared_diff': float(squared_diffs[row, best]),
+                'test_column': col_train
+            }
+        return best_fits
+
+    def save(self, state_file):
+        """
+        Saves the state to a NumPy .npz file.
+
+        Parameters:
+            state_file (str): The file path of the state file.
+        """
+        # Write to a temporary file first so an interrupted run never leaves a broken state behind
+        tmp_file = f"{state_file}.tmp.npz"
+        np.savez(
+            tmp_file,
+            train_columns=np.array(self.train_columns),
+            ideal_columns=np.array(self.ideal_columns),
+            n_rows=self.n_rows,
+            ref_train=self.ref_train,
+            ref_ideal=self.ref_ideal,
+            sum_train=self.sum_train,
+            sum_ideal=self.sum_ideal,
+            sum_train_sq=self.sum_train_sq,
+            sum_ideal_sq=self.sum_ideal_sq,
+            sum_cross=self.sum_cross
+        )
+        os.replace(tmp_file, state_file)
+
+    @classmethod
+    def load(cls, state_file):
+        """
+        Loads a state from a NumPy .npz file.
+
+        Parameters:
+            state_file (str): The file path of the state file.
+
+        Returns:
+            FitState: The loaded state.
+        """
+        with np.load(state_file) as data:
+            state = cls(data['train_columns'].tolist(), data['ideal_columns'].tolist())
+            state.n_rows = int(data['n_rows'])
+            state.sum_train_sq = data['sum_train_sq']
+            state.sum_ideal_sq = data['sum_ideal_sq']
+            state.sum_cross = data['sum_cross']
+            # States saved by older versions hold unshifted sums, which equal reference values of 0
+            if 'ref_train' in data.files:
+                state.ref_train = data['ref_train']
+                state.ref_ideal = data['ref_ideal']
+                state.sum_train = data['sum_train']
+                state.sum_ideal = data['sum_ideal']
+        return state
+
+def update_best_fits(state_file, df_train_new, df_ideal, start_row=None):
+    """
+    Updates the persisted fit state with new training rows and returns the new best fits.
+
+    Parameters:
+        state_file (str): The file path of the state file. It is created if it doesn't exist.
+        df_train_new (pd.DataFrame): The training rows added since the last update.
+        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+        start_row (int): Number of training rows before the new rows, see FitState.update.
+
+    Returns:
+        dict: The best fits over all training rows seen so far.
+
+    Raises:
+        ValueError: If start_row doesn't match the number of rows in the state.
+    """
+    if os.path.exists(state_file):
+        state = FitState.load(state_file)
+    else:
+        state = FitState(df_train_new.columns[1:], df_ideal.columns[1:])
+    state.update(df_train_new, df_ideal, start_row)
+    state.save(state_file)
+    return state.best_fits()
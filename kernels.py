@@ -0,0 +1,135 @@
+import numpy as np
+
+# Numba is optional, the NumPy kernel is used if it isn't installed
+try:
+    import numba
+except ImportError:
+    numba = None
+
+def _fused_score_numpy(train_y, ideal, block_size=4096):
+    """
+    NumPy version of the fused scoring kernel.
+
+    The rows are processed in blocks, so the temporary differences stay small for long datasets.
+
+    Parameters:
+        train_y (np.ndarray): The training column.
+        ideal (np.ndarray): Ideal matrix (rows x ideal columns).
+        block_size (int): Number of rows per block. Default is 4096.
+
+    Returns:
+        tuple: The squared differences and maximum absolute deviations per ideal column.
+    """
+    squared_diffs = np.zeros(ideal.shape[1], dtype=np.float64)
+    max_deviations = np.zeros(ideal.shape[1], dtype=np.float64)
+    for start in range(0, len(train_y), block_size):
+        diff = ideal[start:start + block_size] - train_y[start:start + block_size, None]
+        squared_diffs += np.einsum('ij,ij->j', diff, diff, dtype=np.float64)
+        np.maximum(max_deviations, np.abs(diff).max(axis=0), out=max_deviations)
+    return squared_diffs, max_deviations
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _fused_score_numba(train_y, ideal):
+        """
+        Numba version of the fused scoring kernel.
+
+        Each ideal column is scored in a single pass over the rows, the columns are distributed
+        over all cores with prange. The differences are computed in float64 for any input type.
+
+        Parameters:
+            train_y (np.ndarray): The training column.
+            ideal (np.ndarray): Ideal matrix (rows x ideal columns) in Fortran order.
+
+        Returns:
+            tuple: The squared differences and maximum absolute deviations per ideal column.
+        """
+        n_rows, n_cols = ideal.shape
+        squared_diffs = np.empty(n_cols, dtype=np.float64)
+        max_deviations = np.empty(n_cols, dtype=np.float64)
+        for col in numba.prange(n_cols):
+            total = 0.0
+            largest = 0.0
+            for row in range(n_rows):
+                diff = np.float64(ideal[row, col]) - np.float64(train_y[row])
+                total += diff * diff
+                if abs(diff) > largest or diff != diff:
+                    largest = abs(diff)
+            squared_diffs[col] = total
+            max_deviations[col] = largest
+        return squared_diffs, max_deviations
+
+def available_backends():
+    """
+    List the available kernel backends, fastest first.
+
+    Returns:
+        list: The names of the available backends.
+    """
+    backends = ['numpy']
+    if numba is not None:
+        backends.insert(0, 'numba')
+    return backends
+
+def select_backend(backend='auto'):
+    """
+    Resolve a backend name.
+
+    Parameters:
+        backend (str): 'auto' for the fastest available backend, or the name of a backend.
+
+    Returns:
+        str: The name of the backend.
+
+    Raises:
+        ValueError: If the backend is not available.
+    """
+    if backend == 'auto':
+        return available_backends()[0]
+    if backend not in available_backends():
+        raise ValueError(f"Kernel backend '{backend}' is not available")
+    return backend
+
+def best_index(squared_diffs):
+    """
+    Find the first smallest squared difference, ignoring NaN values.
+
+    Parameters:
+        squared_diffs (np.ndarray): Squared differences per ideal column.
+
+    Returns:
+        int: The index of the best ideal column, or -1 if all values are NaN.
+    """
+    valid = ~np.isnan(squared_diffs)
+    if not valid.any():
+        return -1
+    return int(np.argmin(np.where(valid, squared_diffs, np.inf)))
+
+def fused_score(train, ideal, backend='auto'):
+    """
+    Compute the squared differences, maximum absolute deviations and best ideal columns for all training columns.
+
+    Parameters:
+        train (np.ndarray): Training matrix (rows x train columns).
+        ideal (np.ndarray): Ideal matrix (rows x ideal columns).
+        backend (str): 'auto' for the fastest available backend, 'numba' or 'numpy'. Default is 'auto'.
+
+    Returns:
+        tuple: The squared differences and maximum absolute deviations (train columns x ideal columns),
+               and the index of the best ideal column per training column (-1 if all squared differences are NaN).
+    """
+    backend = select_backend(backend)
+    if backend == 'numba':
+        # The kernel walks down the columns, so the ideal matrix is converted once for the whole call
+        ideal = np.asfortranarray(ideal)
+        kernel = _fused_score_numba
+    else:
+        kernel = _fused_score_numpy
+
+    squared_diffs = np.empty((train.shape[1], ideal.shape[1]), dtype=np.float64)
+    max_deviations = np.empty((train.shape[1], ideal.shape[1]), dtype=np.float64)
+    for idx in range(train.shape[1]):
+        squared_diffs[idx], max_deviations[idx] = kernel(np.ascontiguousarray(train[:, idx]), ideal)
+
+    best = np.array([best_index(row) for row in squared_diffs], dtype=np.intp)
+    return squared_diffs, max_deviations, best
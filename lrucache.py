@@ -0,0 +1,111 @@
+import os
+import tempfile
+
+class LRUDirectoryCache:
+    """
+    Base class for size-bounded on-disk caches with one file per entry.
+
+    Entries are files named after their key and the suffix of the subclass. Their modification
+    time tracks the last use, and the least recently used entries are evicted once the total size
+    exceeds max_bytes.
+
+    Attributes:
+        cache_dir (str): Directory path of the cache files.
+        max_bytes (int): Maximum total size of the cache files in bytes.
+        hits (int): Number of cache hits.
+        misses (int): Number of cache misses.
+        suffix (str): File name suffix of the entries. Must be set in subclasses.
+
+    Methods:
+        stats: Method for reporting the hit/miss statistics.
+    """
+    suffix = None
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        Initializes the LRUDirectoryCache class.
+
+        Parameters:
+            cache_dir (str): Directory path of the cache files.
+            max_bytes (int): Maximum total size of the cache files in bytes.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def stats(self):
+        """
+        Reports the hit/miss statistics and the size of the cache.
+
+        Returns:
+            dict: The number of 'hits', 'misses', cached 'entries' and their total size in 'bytes'.
+        """
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries)
+        }
+
+    def _path(self, key):
+        """
+        Returns the file path of a cache entry.
+        """
+        return os.path.join(self.cache_dir, f'{key}{self.suffix}')
+
+    def _touch(self, key):
+        """
+        Records a hit and updates the modification time of the entry for the LRU eviction.
+        """
+        os.utime(self._path(key))
+        self.hits += 1
+
+    def _store(self, key, write):
+        """
+        Stores an entry and evicts the least recently used entries if the cache is too large.
+
+        Parameters:
+            key (str): The key of the entry.
+            write (callable): Function writing the content of the entry to a binary file object.
+        """
+        # Write to a temporary file first, so a crashed run never leaves a truncated entry behind
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                write(file)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._evict(keep=key)
+
+    def _entries(self):
+        """
+        Returns the modification time, size and name of all cache entries.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.suffix):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        return entries
+
+    def _evict(self, keep=None):
+        """
+        Deletes the least recently used entries until the total size fits into max_bytes.
+
+        Parameters:
+            keep (str): Key of an entry that is never evicted, usually the one just stored.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == f'{keep}{self.suffix}':
+                continue
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
@@ -21,14 +21,25 @@ class CustomError(Exception):
         """
         self.message = message
 
-def main():
+def main(cached=False):
     """
     Main function to demonstrate the usage of loading data from CSV, performing calculations,
     and visualizing results.
+
+    Parameters:
+        cached (bool): If True, the stages run through pipeline.Pipeline, which only loads appended rows,
+                       reuses the cached results of unchanged stages and saves the figures instead of
+                       showing them. Default is False, every stage runs and the figures are shown.
     """
     try:
         database_file = 'Test-DB.db'
 
+        if cached:
+            # Imported here, the pipeline module imports CustomError from this module
+            import pipeline
+            pipeline.main(database_file)
+            return
+
         # Function to load data from CSV into DataFrame
         def load_data(csv_loader_class, csv_filename, table_name):
             """
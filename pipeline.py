@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import pandas as pd
+import numpy as np
+import calculate
+import visio
+from csvloader import CSVLoader1, CSVLoader2, CSVLoader3
+from lrucache import LRUDirectoryCache
+from main import CustomError
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 hash of a file's content.
+
+    Parameters:
+        path (str): The file path.
+        chunk_size (int): Number of bytes read at once. Default is 1 MiB.
+
+    Returns:
+        str: The hexadecimal hash.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class StageCache(LRUDirectoryCache):
+    """
+    Content-addressed on-disk cache for the results of pipeline stages.
+
+    Each entry is a pickle file named after the hash of the stage name, the hashes of its input
+    files, its parameters, the keys of the stages it depends on and the pandas and NumPy versions.
+    Entries that can't be unpickled count as misses. The least recently used entries are evicted
+    once the total size exceeds max_bytes, see lrucache.LRUDirectoryCache.
+
+    Attributes:
+        cache_dir (str): Directory path of the cache files.
+        max_bytes (int): Maximum total size of the cache files in bytes.
+        hits (int): Number of cache hits.
+        misses (int): Number of cache misses.
+
+    Methods:
+        key: Method for computing the key of a stage.
+        get: Method for reading a cached result.
+        put: Method for storing a result.
+    """
+    suffix = '.pkl'
+
+    def __init__(self, cache_dir='.pipeline_cache', max_bytes=256 * 1024 * 1024):
+        """
+        Initializes the StageCache class.
+
+        Parameters:
+            cache_dir (str): Directory path of the cache files. Default is '.pipeline_cache'.
+            max_bytes (int): Maximum total size of the cache files in bytes. Default is 256 MiB.
+        """
+        super().__init__(cache_dir, max_bytes)
+        self._file_hashes = {}
+
+    def key(self, stage, files=(), params=None, parents=()):
+        """
+        Computes the key of a stage.
+
+        Parameters:
+            stage (str): Name of the stage.
+            files (iterable): File paths of the input files.
+            params (dict): JSON-serializable parameters of the stage.
+            parents (iterable): Keys of the stages the stage depends on.
+
+        Returns:
+            str: The hexadecimal key.
+        """
+        description = {
+            'stage': stage,
+            'files': [self._hash_file(path) for path in files],
+            'params': params or {},
+            'parents': list(parents),
+            # Pickles of pandas and NumPy objects may not load with other versions
+            'versions': [pd.__version__, np.__version__]
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Reads a cached result.
+
+        Parameters:
+            key (str): The key of the stage.
+
+        Returns:
+            tuple: (True, result) on a hit, (False, None) on a miss.
+        """
+        try:
+            with open(self._path(key), 'rb') as file:
+                result = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+            # Truncated entries or pickles written by other library versions are recomputed
+            self.misses += 1
+            return False, None
+
+        self._touch(key)
+        return True, result
+
+    def put(self, key, result):
+        """
+        Stores a result and evicts the least recently used entries if the cache is too large.
+
+        Parameters:
+            key (str): The key of the stage.
+            result: The picklable result of the stage.
+        """
+        self._store(key, lambda file: pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _hash_file(self, path):
+        """
+        Returns the content hash of a file, reusing it while size and modification time are unchanged.
+        """
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if signature not in self._file_hashes:
+            self._file_hashes[signature] = file_hash(path)
+        return self._file_hashes[signature]
+
+class Pipeline:
+    """
+    Pipeline runner with a load stage and memoized stages for fitting, mapping and plotting.
+
+    The load stage ingests the rows appended to the CSV files into the database. It needs no cache
+    entry, the loaders skip unchanged files by the content hash stored in the 'ingest_state' table.
+    The fit stage depends on the train and ideal files, the map stage on the ideal and test files
+    and the fit result, and the plot stage on the fit and map results. A rerun with unchanged train
+    and ideal files but a new test file therefore only executes the map and plot stages.
+
+    Attributes:
+        cache (StageCache): The stage cache.
+        output_dir (str): Directory path where the True points files and figures are written.
+        executed (list): Names of the stages executed by the last run.
+        figure_cache (visio.FigureCache): Cache of single figures, so a rerun of the plot stage only renders changed figures.
+        database_file (str): The file path to the SQLite database of the load stage, or None to skip the load stage.
+
+    Methods:
+        run: Method for running the pipeline.
+    """
+    def __init__(self, cache=None, output_dir='./', figure_cache=None, database_file=None):
+        """
+        Initializes the Pipeline class.
+
+        Parameters:
+            cache (StageCache): The stage cache. Default is a StageCache in '.pipeline_cache'.
+            output_dir (str): Directory path where the True points files and figures are written.
+            figure_cache (visio.FigureCache): Cache of single figures. Default is None.
+            database_file (str): The file path to the SQLite database of the load stage. Default is None, no load stage.
+        """
+        self.cache = cache if cache is not None else StageCache()
+        self.output_dir = output_dir
+        self.figure_cache = figure_cache
+        self.database_file = database_file
+        self.executed = []
+
+    def run(self, train_csv='train.csv', test_csv='test.csv', ideal_csv='ideal.csv', params=None):
+        """
+        Runs the pipeline, executing only the stages whose inputs have changed.
+
+        Parameters:
+            train_csv (str): The file path to the train CSV file.
+            test_csv (str): The file path to the test CSV file.
+            ideal_csv (str): The file path to the ideal CSV file.
+            params (dict): Parameters of the fit stage, passed to calculate.calculate_best_fits.
+
+        Returns:
+            dict: 'best_fits', 'individual_tables' and the file paths of the 'figures'.
+
+        Raises:
+            CustomError: If a stage fails.
+        """
+        params = params or {}
+        self.executed = []
+        frames = {}
+        if self.database_file is not None:
+            self._load(train_csv, test_csv, ideal_csv)
+
+        def load(path):
+            # The CSV files are only read if a stage depending on them is executed
+            if path not in frames:
+                frames[path] = pd.read_csv(path)
+            return frames[path]
+
+        fit_key = self.cache.key('fit', [train_csv, ideal_csv], params)
+        best_fits = self._stage('fit', fit_key, lambda: calculate.calculate_best_fits(load(train_csv), load(ideal_csv), **params))
+
+        map_key = self.cache.key('map', [ideal_csv, test_csv], parents=[fit_key])
+        individual_tables = self._stage('map', map_key, lambda: calculate.generate_individual_tables(
+            load(ideal_csv), load(test_csv), best_fits, self.output_dir
+        ))
+        if 'map' not in self.executed:
+            self._write_true_points(individual_tables, best_fits)
+
+        plot_key = self.cache.key('plot', [train_csv, ideal_csv], parents=[fit_key, map_key])
+        figures = self._stage('plot', plot_key, lambda: self._render(load(ideal_csv), load(train_csv), best_fits, individual_tables))
+
+        paths = []
+        for filename, content in figures.items():
+            path = os.path.join(self.output_dir, filename)
+            with open(path, 'wb') as file:
+                file.write(content)
+            paths.append(path)
+
+        return {'best_fits': best_fits, 'individual_tables': individual_tables, 'figures': paths}
+
+    def _stage(self, name, key, compute):
+        """
+        Returns the cached result of a stage or computes and stores it.
+
+        Parameters:
+            name (str): Name of the stage.
+            key (str): The key of the stage.
+            compute (callable): Function computing the result of the stage.
+
+        Returns:
+            The result of the stage.
+
+        Raises:
+            CustomError: If the stage fails. The calculate functions report errors by returning None,
+                         which is never cached.
+        """
+        hit, result = self.cache.get(key)
+        if hit and result is not None:
+            return result
+        result = compute()
+        self.executed.append(name)
+        if result is None:
+            raise CustomError(f"The '{name}' stage failed")
+        self.cache.put(key, result)
+        return result
+
+    def _load(self, train_csv, test_csv, ideal_csv):
+        """
+        Loads the rows appended to the CSV files into the database.
+
+        Raises:
+            CustomError: If a CSV file can't be loaded.
+        """
+        loaded = 0
+        for loader_class, csv_file, table_name in ((CSVLoader1, train_csv, 'train'), (CSVLoader2, test_csv, 'test'), (CSVLoader3, ideal_csv, 'ideal')):
+            loader = loader_class(self.database_file, table_name)
+            try:
+                loaded += len(loader.process_data(csv_file, incremental=True))
+            except ValueError as e:
+                raise CustomError(f"The 'load' stage failed for '{csv_file}': {e}")
+            finally:
+                loader.engine.dispose()
+        if loaded:
+            self.executed.append('load')
+
+    def _write_true_points(self, individual_tables, best_fits):
+        """
+        Writes the True points files from cached individual tables.
+        """
+        for column, table in individual_tables.items():
+            ideal_column = best_fits[column]['best_fit_col_ideal']
+            table[table['result'] == True].to_csv(f"{self.output_dir}/True_Points_{ideal_column}.csv", index=False)
+
+    def _render(self, df_ideal, df_train, best_fits, individual_tables):
+        """
+        Renders all figures and returns their PNG content by file name.
+        """
+        visualizer = visio.ResultVisualizer(cache=self.figure_cache)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = visualizer.plot_results_1(df_ideal, best_fits, df_train, output_dir=tmp_dir) or []
+            paths += visualizer.plot_result_2(individual_tables, best_fits, output_dir=tmp_dir) or []
+            figures = {}
+            for path in paths:
+                with open(path, 'rb') as file:
+                    figures[os.path.basename(path)] = file.read()
+        return figures
+
+def main(database_file=None):
+    """
+    Main function to run the cached pipeline on train.csv, test.csv and ideal.csv.
+
+    Parameters:
+        database_file (str): If given, the CSV files are loaded into this SQLite database first. Default is None.
+    """
+    pipeline = Pipeline(database_file=database_file)
+    try:
+        result = pipeline.run()
+    except CustomError as e:
+        print("Custom Error:", e.message)
+        return
+    print(f"Executed stages: {', '.join(pipeline.executed) or 'none'}")
+    print(f"Figures: {', '.join(result['figures'])}")
+
+if __name__ == "__main__":
+    main()
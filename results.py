@@ -0,0 +1,147 @@
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+class MappingResult(Mapping):
+    """
+    Compact representation of the mapping of test points onto the best fitting ideal functions.
+
+    Instead of one full table per ideal function, a single table holds one row per test point:
+    x, y, the index of the assigned function as a small integer (-1 if no function is within the
+    threshold) and the deviation to the nearest function as float32. The per-function tables of
+    generate_individual_tables are available as lazy views, computed on access from the shared
+    ideal dataset, so the object can be passed wherever the dict of individual tables is expected.
+
+    Attributes:
+        table (pd.DataFrame): One row per test point with the columns 'x', 'y', 'function' and 'deviation', sorted by x.
+        columns (list): Names of the Y-columns in the training dataset, indexed by 'function'.
+        ideal_columns (list): Names of the best fitting ideal functions, in the order of columns.
+        threshold (float): Maximum distance for a test point to be assigned to an ideal function.
+
+    Methods:
+        from_test_data: Method for mapping the test data.
+        view: Method for computing the individual table of one function.
+        write_true_points: Method for writing the True points files.
+        memory_usage: Method for computing the memory footprint in bytes.
+    """
+    def __init__(self, table, columns, ideal_columns, df_ideal, ideal_rows, threshold):
+        """
+        Initializes the MappingResult class. Use from_test_data to create a result.
+
+        Parameters:
+            table (pd.DataFrame): One row per test point with the columns 'x', 'y', 'function' and 'deviation'.
+            columns (list): Names of the Y-columns in the training dataset.
+            ideal_columns (list): Names of the best fitting ideal functions, in the order of columns.
+            df_ideal (pd.DataFrame): The ideal dataset, referenced by the lazy views.
+            ideal_rows (np.ndarray): Row position in df_ideal of each test point.
+            threshold (float): Maximum distance for a test point to be assigned to an ideal function.
+        """
+        self.table = table
+        self.columns = list(columns)
+        self.ideal_columns = list(ideal_columns)
+        self.threshold = threshold
+        self._df_ideal = df_ideal
+        self._ideal_rows = ideal_rows
+
+    @classmethod
+    def from_test_data(cls, df_ideal, df_test, best_fits, threshold=np.sqrt(2)):
+        """
+        Maps the test points onto the best fitting ideal functions.
+
+        Parameters:
+            df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+            df_test (pd.DataFrame): Test dataset with the columns 'x' and 'y'.
+            best_fits (dict): Dictionary containing the best fit in the ideal dataset for each Y-column in the training dataset.
+            threshold (float): Maximum distance for a test point to be assigned to an ideal function.
+                               Default is the square root of 2, like in generate_individual_tables.
+
+        Returns:
+            MappingResult: The compact mapping result.
+
+        Raises:
+            KeyError: If an x value of the test data is missing in the ideal dataset.
+        """
+        columns = list(best_fits)
+        ideal_columns = [best_fits[column]['best_fit_col_ideal'] for column in columns]
+        df_test_sorted = df_test.sort_values(by='x', ascending=True).reset_index(drop=True)
+        test_x = df_test_sorted['x'].to_numpy()
+        test_y = df_test_sorted['y'].to_numpy()
+
+        # Locate the test points in the ideal dataset once for all functions
+        ideal_x = df_ideal['x'].to_numpy()
+        order = np.argsort(ideal_x, kind='stable')
+        positions = np.minimum(np.searchsorted(ideal_x[order], test_x), len(order) - 1)
+        ideal_rows = order[positions]
+        missing = ideal_x[ideal_rows] != test_x
+        if missing.any():
+            raise KeyError(f"x values not found in the ideal dataset: {test_x[missing].tolist()}")
+
+        ideal_y = df_ideal[ideal_columns].to_numpy(dtype=float)[ideal_rows]
+        distances = np.abs(ideal_y - test_y.astype(float)[:, None])
+        nearest = distances.argmin(axis=1) if columns else np.zeros(len(test_x), dtype=np.intp)
+        deviation = distances[np.arange(len(test_x)), nearest] if columns else np.full(len(test_x), np.inf)
+
+        index_dtype = np.int8 if len(columns) < 128 else np.int16
+        function = np.where(deviation < threshold, nearest, -1).astype(index_dtype)
+
+        table = pd.DataFrame({
+            'x': test_x,
+            'y': test_y,
+            'function': function,
+            'deviation': deviation.astype(np.float32)
+        })
+        return cls(table, columns, ideal_columns, df_ideal, ideal_rows.astype(np.int32), threshold)
+
+    def view(self, column):
+        """
+        Computes the individual table of one function, in the layout of generate_individual_tables.
+
+        Parameters:
+            column (str): Name of the Y-column in the training dataset.
+
+        Returns:
+            pd.DataFrame: The table with the columns 'x', 'ideal_y', 'test_y', 'distance', 'result' and 'ideal_function_number'.
+        """
+        ideal_column = self.ideal_columns[self.columns.index(column)]
+        ideal_y = pd.Series(self._df_ideal[ideal_column].to_numpy()[self._ideal_rows])
+        test_y = self.table['y']
+        distances = np.abs(ideal_y - test_y)
+        return pd.DataFrame({
+            'x': self.table['x'],
+            'ideal_y': ideal_y,
+            'test_y': test_y,
+            'distance': distances,
+            'result': distances < self.threshold,
+            'ideal_function_number': ideal_column.split('_')[-1]
+        })
+
+    def write_true_points(self, output_dir='./'):
+        """
+        Writes the True points of each function to CSV files, like generate_individual_tables.
+
+        Parameters:
+            output_dir (str): Directory path where the CSV files will be saved. Default is the current directory.
+        """
+        for column, ideal_column in zip(self.columns, self.ideal_columns):
+            table = self.view(column)
+            table[table['result'] == True].to_csv(f"{output_dir}/True_Points_{ideal_column}.csv", index=False)
+
+    def memory_usage(self):
+        """
+        Computes the memory footprint of the compact table in bytes. The shared ideal dataset is not counted.
+
+        Returns:
+            int: The number of bytes.
+        """
+        return int(self.table.memory_usage(index=True, deep=True).sum() + self._ideal_rows.nbytes)
+
+    def __getitem__(self, column):
+        if column not in self.columns:
+            raise KeyError(column)
+        return self.view(column)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
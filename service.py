@@ -0,0 +1,316 @@
+import asyncio
+import json
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+import calculate
+
+class MappingModel:
+    """
+    Resident model for mapping test points onto the best fitting ideal functions.
+
+    Attributes:
+        ideal_x (np.ndarray): The sorted x values of the ideal dataset.
+        best_fits (dict): Dictionary containing the best fit in the ideal dataset for each Y-column in the training dataset.
+                          Y-columns without a valid fit are left out.
+        unfitted_columns (list): Names of the Y-columns in the training dataset without a valid fit, e.g. with NaN values.
+        ideal_y (np.ndarray): The Y-values of the best fitting ideal functions (rows x best fits), sorted by x.
+        threshold (float): Maximum distance for a test point to be assigned to an ideal function.
+
+    Methods:
+        from_csv: Method for creating the model from the train and ideal CSV files.
+        map_points: Method for mapping a batch of test points.
+    """
+    def __init__(self, df_ideal, best_fits, threshold=np.sqrt(2)):
+        """
+        Initializes the MappingModel class.
+
+        Parameters:
+            df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
+            best_fits (dict): Dictionary containing the best fit in the ideal dataset for each Y-column in the training dataset.
+            threshold (float): Maximum distance for a test point to be assigned to an ideal function.
+                               Default is the square root of 2, like in generate_individual_tables.
+        """
+        df_ideal = df_ideal.sort_values(by='x')
+        self.best_fits = {column: fit_info for column, fit_info in best_fits.items() if fit_info['best_fit_col_ideal'] is not None}
+        self.unfitted_columns = [column for column in best_fits if column not in self.best_fits]
+        for column in self.unfitted_columns:
+            print(f"Y-column '{column}' has no valid best fit and is not mapped.")
+        self.ideal_x = df_ideal['x'].to_numpy(dtype=float)
+        self.ideal_y = df_ideal[[fit_info['best_fit_col_ideal'] for fit_info in self.best_fits.values()]].to_numpy(dtype=float)
+        self.threshold = threshold
+
+    @classmethod
+    def from_csv(cls, train_csv, ideal_csv):
+        """
+        Creates the model by loading the CSV files and calculating the best fits once.
+
+        Parameters:
+            train_csv (str): The file path to the train CSV file.
+            ideal_csv (str): The file path to the ideal CSV file.
+
+        Returns:
+            MappingModel: The model.
+        """
+        df_train = pd.read_csv(train_csv)
+        df_ideal = pd.read_csv(ideal_csv)
+        return cls(df_ideal, calculate.calculate_best_fits(df_train, df_ideal))
+
+    def map_points(self, x, y):
+        """
+        Maps a batch of test points onto the best fitting ideal functions.
+
+        Parameters:
+            x (np.ndarray): The x values of the test points.
+            y (np.ndarray): The y values of the test points.
+
+        Returns:
+            list: One dictionary per test point with the ideal Y-value, the distance and the result
+                  for each best fit, or an 'error' if the x value is not part of the ideal dataset.
+        """
+        positions = np.searchsorted(self.ideal_x, x)
+        positions = np.minimum(positions, len(self.ideal_x) - 1)
+        found = self.ideal_x[positions] == x
+
+        ideal_y = self.ideal_y[positions]
+        distances = np.abs(ideal_y - y[:, None])
+        results = distances < self.threshold
+
+        mapped = []
+        for row in range(len(x)):
+            if not found[row]:
+                mapped.append({'x': float(x[row]), 'y': float(y[row]), 'error': f"x value {x[row]} not found in the ideal dataset"})
+                continue
+            mapped.append({
+                'x': float(x[row]),
+                'y': float(y[row]),
+                'matches': [
+                    {
+                        'test_column': column,
+                        'ideal_function': fit_info['best_fit_col_ideal'],
+                        'ideal_y': float(ideal_y[row, idx]),
+                        'distance': float(distances[row, idx]),
+                        'result': bool(results[row, idx])
+                    }
+                    for idx, (column, fit_info) in enumerate(self.best_fits.items())
+                ]
+            })
+        return mapped
+
+class MappingService:
+    """
+    Long-running asyncio service answering test-point mapping requests.
+
+    Clients send one JSON object per line: {"points": [[x, y], ...]} to map points or {"stats": true}
+    to query the latency percentiles. Points of concurrent requests are coalesced into micro-batches
+    of at most max_batch_size points, waiting at most max_latency seconds for a batch to fill up.
+
+    Attributes:
+        model (MappingModel): The resident mapping model.
+        max_batch_size (int): Maximum number of points mapped in one batch.
+        max_latency (float): Maximum time in seconds a request waits for its batch to fill up.
+        latencies (deque): Latencies in seconds of the most recent requests.
+
+    Methods:
+        start: Method for starting the server on a TCP port or a Unix socket.
+        stop: Method for stopping the server.
+        map_points: Method for mapping points through the micro-batching queue.
+        latency_percentiles: Method for computing the request latency percentiles.
+    """
+    def __init__(self, model, max_batch_size=1024, max_latency=0.005, latency_window=10000):
+        """
+        Initializes the MappingService class.
+
+        Parameters:
+            model (MappingModel): The resident mapping model.
+            max_batch_size (int): Maximum number of points mapped in one batch. Default is 1024.
+            max_latency (float): Maximum time in seconds a request waits for its batch to fill up. Default is 5 ms.
+            latency_window (int): Number of recent requests kept for the latency percentiles. Default is 10000.
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.latencies = deque(maxlen=latency_window)
+        self.server = None
+        self._queue = None
+        self._batcher = None
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        """
+        Starts the server.
+
+        Parameters:
+            host (str): Host to listen on. Default is localhost.
+            port (int): TCP port to listen on. Use 0 to pick a free port. Default is 8765.
+            path (str): File path of a Unix socket. If given, host and port are ignored.
+
+        Returns:
+            asyncio.AbstractServer: The running server.
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle_client, path=path)
+        else:
+            self.server = await asyncio.start_server(self._handle_client, host, port)
+        return self.server
+
+    async def stop(self):
+        """
+        Stops the server and the batching task.
+        """
+        self.server.close()
+        await self.server.wait_closed()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+
+    async def map_points(self, points):
+        """
+        Maps points through the micro-batching queue.
+
+        Parameters:
+            points (list): The test points as [x, y] pairs.
+
+        Returns:
+            list: The mapped points, see MappingModel.map_points.
+
+        Raises:
+            ValueError: If the points are not a list of [x, y] pairs.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.size == 0:
+            points = points.reshape(0, 2)
+        if points.ndim != 2 or points.shape[1] != 2:
+            raise ValueError("The points must be a list of [x, y] pairs")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((points, future))
+        return await future
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)):
+        """
+        Computes the latency percentiles of the recent requests.
+
+        Parameters:
+            percentiles (tuple): The percentiles to compute. Default is (50, 90, 99).
+
+        Returns:
+            dict: The latency in milliseconds per percentile, e.g. {'p50': 0.8}, and the number of 'requests'.
+        """
+        stats = {'requests': len(self.latencies)}
+        if self.latencies:
+            values = np.percentile(np.fromiter(self.latencies, dtype=float), percentiles) * 1000
+            stats.update({f'p{p}': float(value) for p, value in zip(percentiles, values)})
+        return stats
+
+    async def _run_batches(self):
+        """
+        Collects queued requests into micro-batches and maps them.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_latency
+
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            points = np.concatenate([request[0] for request in batch])
+            try:
+                mapped = self.model.map_points(points[:, 0], points[:, 1])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for request_points, future in batch:
+                if not future.done():
+                    future.set_result(mapped[start:start + len(request_points)])
+                start += len(request_points)
+
+    async def _handle_client(self, reader, writer):
+        """
+        Answers the requests of one client connection.
+
+        Parameters:
+            reader (asyncio.StreamReader): The stream to read requests from.
+            writer (asyncio.StreamWriter): The stream to write responses to.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                    if request.get('stats'):
+                        response = {'stats': self.latency_percentiles()}
+                    else:
+                        response = {'results': await self.map_points(request['points'])}
+                        self.latencies.append(time.perf_counter() - received)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    response = {'error': str(e)}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+async def request_mapping(points, host='127.0.0.1', port=8765, path=None):
+    """
+    Local client sending one mapping request to a running MappingService.
+
+    Parameters:
+        points (list): The test points as [x, y] pairs.
+        host (str): Host of the service. Default is localhost.
+        port (int): TCP port of the service. Default is 8765.
+        path (str): File path of a Unix socket. If given, host and port are ignored.
+
+    Returns:
+        dict: The response of the service.
+    """
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(json.dumps({'points': points}).encode() + b'\n')
+        await writer.drain()
+        return json.loads(await reader.readline())
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+def main():
+    """
+    Main function to start the mapping service for train.csv and ideal.csv on localhost.
+    """
+    async def serve():
+        service = MappingService(MappingModel.from_csv('train.csv', 'ideal.csv'))
+        server = await service.start()
+        print(f"Mapping service listening on {server.sockets[0].getsockname()}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Mapping service stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,10 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 import pandas as pd
 import numpy as np
-
-def calculate_least_square(df_train, df_ideal):
-    """
-    Calculate the best fit and squared differences for each Y-column in the training dataset.
-
-    Parameters:
-        df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
-        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
-
-    Returns:
-        dict: A dictionary containing the best fit in the ideal dataset and the associated squared difference
-              for each Y-column in the training dataset.
-    """
-    best_fits = {}
-
-    # Loop through each column in the training dataset
-    for col_train in df_train.columns[1:]:
-        min_squared_diff = float('inf')
-        best_fit_col_ideal = None
-
-        # Loop through each column in the ideal dataset
-        for col_ideal in df_ideal.columns[1:]:
-            # Calculate squared differences between corresponding columns
-            squared_diff_sum = sum((df_ideal[col_ideal] - df_train[col_train]) ** 2)
-
-            # Update if current fit is better than previous best fit
-            if squared_diff_sum < min_squared_diff:
-                min_squared_diff = squared_diff_sum
-                best_fit_col_ideal = col_ideal
-
-        # Store the best fit and associated squared difference
-        best_fits[col_train] = {'best_fit_col_ideal': best_fit_col_ideal, 'squared_diff': min_squared_diff, 'test_column': col_train}
-
-    return best_fits
-
-def generate_individual_tables(df_ideal, df_test, best_fits, output_dir='./'):
-    """
-    Generate individual tables for each Y-column in the ideal dataset and save them as CSV files.
-
-    Parameters:
-        df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
-        df_test (pd.DataFrame): Test dataset with 'x' as the first column and Y columns thereafter.
-        best_fits (dict): Dictionary containing the best fit in the ideal dataset and the associated squared difference
-                          for each Y-column in the training dataset.
-
-    Returns:
-        dict: A dictionary containing individual tables for each Y-column in the ideal dataset.
-    """
-    individual_tables = {}
-
-    # Loop through each Y-column in the best fits dictionary
-    for column, fit_info in best_fits.items():
-        ideal_column = fit_info['best_fit_col_ideal']
-        
-        # Sort the test dataset in ascending order by the X column
-        df_test_sorted = df_test.sort_values(by='x', ascending=True).reset_index(drop=True)
-        
-        # Adjust Y-values for both test and ideal functions
-        adjusted_ideal_y = df_ideal.set_index('x').loc[df_test_sorted['x'], ideal_column].reset_index(drop=True)
-        adjusted_test_y = df_test_sorted['y'].reset_index(drop=True)
-        
-        # Calculate distances between corresponding points in ideal and adjusted test datasets
-        distances = np.abs(adjusted_ideal_y - adjusted_test_y)
-        
-        # Check if distance is less than square root of 2
-        results = distances < np.sqrt(2)
-        
-        # Create individual table for the Y-column
-        table_data = {
-            'x': df_test_sorted['x'],
-            'ideal_y': adjusted_ideal_y,
-            'test_y': adjusted_test_y,
-            'distance': distances,
-            'result': results,
-            'ideal_function_number': ideal_column.split('_')[-1]
-        }
-        
-        individual_tables[column] = pd.DataFrame(table_data)
-        
-        # Include the Y-value of the ideal function in the table header
-        print(f"Table for Ideal Y-column '{ideal_column}'")
-        print(individual_tables[column])
-        print("\n")
-
-         # Save table with True values to CSV
-        true_table = individual_tables[column][individual_tables[column]['result'] == True]
-        true_table.to_csv(f"{output_dir}/True_Points_{ideal_column}.csv", index=False)
-        print(f"True points for Ideal Y-column '{ideal_column}'")
-        true_table = individual_tables[column][individual_tables[column]['result'] == True]
-        print(true_table)
-        print("\n")
-
-    return individual_tables
+import calculate
 
 class TestLeastSquare(unittest.TestCase):
     def setUp(self):
@@ -111,10 +22,10 @@ class TestLeastSquare(unittest.TestCase):
         })
 
     def test_calculate_least_square(self):
-        best_fits = calculate_least_square(self.df_train, self.df_ideal)
+        best_fits = calculate.calculate_least_square(self.df_train, self.df_ideal)
         expected_result = {
-            'y1': {'best_fit_col_ideal': 'y1', 'squared_diff': 0, 'test_column': 'y1'},
-            'y2': {'best_fit_col_ideal': 'y2', 'squared_diff': 0, 'test_column': 'y2'}
+            'y1': {'best_fit_col_ideal': 'y1', 'squared_diff': 4, 'test_column': 'y1'},
+            'y2': {'best_fit_col_ideal': 'y1', 'squared_diff': 0, 'test_column': 'y2'}
         }
         self.assertDictEqual(best_fits, expected_result)
 
@@ -138,15 +49,15 @@ class TestGenerateIndividualTables(unittest.TestCase):
         }
 
     def test_generate_individual_tables(self):
-        individual_tables = generate_individual_tables(self.df_ideal, self.df_test, self.best_fits)
+        individual_tables = calculate.generate_individual_tables(self.df_ideal, self.df_test, self.best_fits, tempfile.gettempdir())
         expected_result = {
             'y1': pd.DataFrame({
                 'x': [1, 2, 3, 4],
                 'ideal_y': [2, 3, 4, 5],
                 'test_y': [1.5, 3.5, 4.5, 6.5],
-                'distance': [0.5, 0.5, 0.5, 0.5],
-                'result': [True, True, True, True],
-                'ideal_function_number': ['1', '1', '1', '1']
+                'distance': [0.5, 0.5, 0.5, 1.5],
+                'result': [True, True, True, False],
+                'ideal_function_number': ['y1', 'y1', 'y1', 'y1']
             }),
             'y2': pd.DataFrame({
                 'x': [1, 2, 3, 4],
@@ -154,11 +65,293 @@ class TestGenerateIndividualTables(unittest.TestCase):
                 'test_y': [1.5, 3.5, 4.5, 6.5],
                 'distance': [1.5, 0.5, 0.5, 0.5],
                 'result': [False, True, True, True],
-                'ideal_function_number': ['2', '2', '2', '2']
+                'ideal_function_number': ['y2', 'y2', 'y2', 'y2']
             })
         }
         for key in expected_result.keys():
             pd.testing.assert_frame_equal(individual_tables[key], expected_result[key])
 
+class TestTopK(unittest.TestCase):
+    def setUp(self):
+        self.df_train = pd.DataFrame({
+            'x': [1, 2, 3, 4],
+            'y1': [1, 2, 3, 4]
+        })
+        self.df_ideal = pd.DataFrame({
+            'x': [1, 2, 3, 4],
+            'y1': [2, 3, 4, 5],
+            'y2': [1, 2, 3, 5],
+            'y3': [0, 1, 2, 3],
+            'y4': [1, 2, 3, 4]
+        })
+
+    def test_ranked_candidates(self):
+        best_fits = calculate.calculate_top_k(self.df_train, self.df_ideal, k=3)
+        fit_info = best_fits['y1']
+        self.assertEqual(fit_info['best_fit_col_ideal'], 'y4')
+        self.assertEqual(fit_info['squared_diff'], 0)
+        self.assertEqual(fit_info['r_squared'], 1)
+
+        # y1 and y3 tie on the squared difference, the column order decides
+        self.assertEqual([c['ideal_column'] for c in fit_info['candidates']], ['y4', 'y2', 'y1'])
+        self.assertEqual(fit_info['candidates'][2]['max_deviation'], 1)
+        self.assertEqual(fit_info['candidates'][2]['rmse'], 1)
+        self.assertEqual(fit_info['candidates'][2]['r_squared'], 1 - 4 / 5)
+
+    def test_matches_least_square(self):
+        rng = np.random.default_rng(1)
+        df_train = pd.DataFrame({'x': range(50), **{f'y{i}': rng.normal(size=50) for i in range(1, 5)}})
+        df_ideal = pd.DataFrame({'x': range(50), **{f'y{i}': rng.normal(size=50) for i in range(1, 31)}})
+        expected = calculate.calculate_least_square(df_train, df_ideal)
+        best_fits = calculate.calculate_top_k(df_train, df_ideal, k=5)
+        for col in expected:
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], expected[col]['best_fit_col_ideal'])
+            self.assertAlmostEqual(best_fits[col]['squared_diff'], expected[col]['squared_diff'])
+            self.assertEqual(len(best_fits[col]['candidates']), 5)
+
+    def test_tied_group_larger_than_k(self):
+        self.assertEqual(calculate._rank_candidates(np.array([1.0, 0, 0, 2, 0, 3, 0]), 3).tolist(), [1, 2, 4])
+
+        # Five exact duplicates of the best function, the first one in column order wins
+        rng = np.random.default_rng(3)
+        df_ideal = pd.DataFrame({'x': range(40), **{f'y{i}': rng.normal(size=40) for i in range(1, 21)}})
+        for i in (3, 4, 9, 12, 17):
+            df_ideal[f'y{i}'] = df_ideal['y7']
+        df_train = pd.DataFrame({'x': range(40), 'y1': df_ideal['y7'] + 0.01})
+        expected = calculate.calculate_least_square(df_train, df_ideal)
+        for k in (1, 2, 3):
+            best_fits = calculate.calculate_top_k(df_train, df_ideal, k=k)
+            self.assertEqual(best_fits['y1']['best_fit_col_ideal'], expected['y1']['best_fit_col_ideal'])
+            self.assertEqual([c['ideal_column'] for c in best_fits['y1']['candidates']], ['y3', 'y4', 'y7'][:k])
+
+class TestCompactMode(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        x = np.linspace(-20, 20, 400)
+        self.df_ideal = pd.DataFrame({'x': x, **{f'y{i}': rng.normal(size=400).cumsum() for i in range(1, 51)}})
+        self.df_train = pd.DataFrame({
+            'x': x,
+            **{f'y{i}': self.df_ideal[f'y{j}'] + rng.normal(scale=0.3, size=400) for i, j in enumerate([7, 19, 33, 48], 1)}
+        })
+
+    def test_vectorized_matches_least_square(self):
+        expected = calculate.calculate_least_square(self.df_train, self.df_ideal)
+        best_fits = calculate.calculate_best_fits(self.df_train, self.df_ideal)
+        for col in expected:
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], expected[col]['best_fit_col_ideal'])
+            self.assertAlmostEqual(best_fits[col]['squared_diff'], expected[col]['squared_diff'])
+
+    def test_compact_precision(self):
+        check = calculate.verify_compact_precision(self.df_train, self.df_ideal)
+        self.assertTrue(check['match'])
+        self.assertEqual(check['mismatches'], {})
+        self.assertLess(check['max_relative_error'], 1e-4)
+
+    def test_compact_only_for_float32_input(self):
+        with patch.object(calculate, '_to_matrices', wraps=calculate._to_matrices) as mock_to_matrices:
+            calculate.calculate_best_fits(self.df_train, self.df_ideal, compact=True)
+            self.assertEqual(mock_to_matrices.call_args.args[2], np.float64)
+
+            df_compact = self.df_ideal.astype({column: 'float32' for column in self.df_ideal.columns[1:]})
+            best_fits = calculate.calculate_best_fits(self.df_train, df_compact, compact=True)
+            self.assertEqual(mock_to_matrices.call_args.args[2], np.float32)
+        self.assertEqual([fit['best_fit_col_ideal'] for fit in best_fits.values()], ['y7', 'y19', 'y33', 'y48'])
+
+class TestPrunedSearch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        x = np.linspace(-20, 20, 400)
+        ideal = {f'y{i}': rng.normal(size=400).cumsum() + rng.normal(scale=20) for i in range(1, 201)}
+        # Duplicates produce exact ties, which must be resolved by the column order
+        ideal['y201'] = ideal['y42'].copy()
+        self.df_ideal = pd.DataFrame({'x': x, **ideal})
+        self.df_train = pd.DataFrame({
+            'x': x,
+            'y1': self.df_ideal['y201'],
+            'y2': self.df_ideal['y17'] + rng.normal(scale=0.5, size=400),
+            'y3': rng.normal(size=400),
+            'y4': self.df_ideal['y150'] * 1.1
+        })
+
+    def test_matches_exact_search(self):
+        exact = calculate.calculate_top_k(self.df_train, self.df_ideal, k=5)
+        pruned = calculate.calculate_best_fits_pruned(self.df_train, self.df_ideal, k=5, row_block=16, candidate_block=8)
+        self.assertEqual(pruned['y1']['best_fit_col_ideal'], 'y42')
+        for col in exact:
+            self.assertEqual(
+                [c['ideal_column'] for c in pruned[col]['candidates']],
+                [c['ideal_column'] for c in exact[col]['candidates']]
+            )
+            for pruned_candidate, exact_candidate in zip(pruned[col]['candidates'], exact[col]['candidates']):
+                self.assertAlmostEqual(pruned_candidate['squared_diff'], exact_candidate['squared_diff'], places=6)
+
+    def test_k_larger_than_catalog(self):
+        pruned = calculate.calculate_best_fits_pruned(self.df_train, self.df_ideal.iloc[:, :4], k=10)
+        self.assertEqual(len(pruned['y1']['candidates']), 3)
+
+    def test_nan_values(self):
+        self.df_train.loc[5, 'y3'] = np.nan
+        self.df_ideal.loc[7, 'y17'] = np.nan
+        expected = calculate.calculate_least_square(self.df_train, self.df_ideal)
+        pruned = calculate.calculate_best_fits_pruned(self.df_train, self.df_ideal, k=3)
+        self.assertIsNone(pruned['y3']['best_fit_col_ideal'])
+        self.assertEqual(pruned['y3']['squared_diff'], float('inf'))
+        self.assertEqual(pruned['y3']['candidates'], [])
+        for col in expected:
+            self.assertEqual(pruned[col]['best_fit_col_ideal'], expected[col]['best_fit_col_ideal'])
+        self.assertNotIn('y17', [c['ideal_column'] for c in pruned['y2']['candidates']])
+
+class TestMultiResolution(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        x = np.linspace(-20, 20, 400)
+        self.df_ideal = pd.DataFrame({'x': x, **{f'y{i}': rng.normal(size=400).cumsum() for i in range(1, 101)}})
+        self.df_train = pd.DataFrame({
+            'x': x,
+            **{f'y{i}': self.df_ideal[f'y{j}'] + rng.normal(scale=0.5, size=400) for i, j in enumerate([3, 30, 60, 99], 1)}
+        })
+
+    def test_matches_exact_search(self):
+        exact = calculate.calculate_best_fits(self.df_train, self.df_ideal)
+        best_fits = calculate.calculate_best_fits_multires(self.df_train, self.df_ideal, stride=16, shortlist=3)
+        for col in exact:
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], exact[col]['best_fit_col_ideal'])
+            self.assertAlmostEqual(best_fits[col]['squared_diff'], exact[col]['squared_diff'])
+            self.assertTrue(best_fits[col]['certified'])
+            self.assertLessEqual(best_fits[col]['rescored'], 100)
+
+    def test_uncertified_result_is_reported(self):
+        # Noise without structure averages out on the coarse grid, so a shortlist of one can't be certified
+        rng = np.random.default_rng(5)
+        df_ideal = pd.DataFrame({'x': range(64), **{f'y{i}': rng.normal(size=64) for i in range(1, 21)}})
+        df_train = pd.DataFrame({'x': range(64), 'y1': rng.normal(size=64)})
+        best_fits = calculate.calculate_best_fits_multires(df_train, df_ideal, stride=64, shortlist=1, guarantee=False)
+        self.assertFalse(best_fits['y1']['certified'])
+        self.assertEqual(best_fits['y1']['rescored'], 1)
+
+    def test_nan_values(self):
+        self.df_train.loc[10, 'y2'] = np.nan
+        self.df_ideal.loc[20, 'y3'] = np.nan
+        expected = calculate.calculate_least_square(self.df_train, self.df_ideal)
+        best_fits = calculate.calculate_best_fits_multires(self.df_train, self.df_ideal, stride=16, shortlist=3)
+        self.assertIsNone(best_fits['y2']['best_fit_col_ideal'])
+        self.assertEqual(best_fits['y2']['squared_diff'], float('inf'))
+        self.assertFalse(best_fits['y2']['certified'])
+        for col in expected:
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], expected[col]['best_fit_col_ideal'])
+            self.assertFalse(np.isnan(best_fits[col]['squared_diff']))
+
+        top_k = calculate.calculate_top_k(self.df_train, self.df_ideal, k=3)
+        self.assertIsNone(top_k['y2']['best_fit_col_ideal'])
+        self.assertEqual(top_k['y2']['candidates'], [])
+        self.assertEqual(top_k['y1']['best_fit_col_ideal'], expected['y1']['best_fit_col_ideal'])
+        self.assertNotIn('y3', [c['ideal_column'] for c in top_k['y1']['candidates']])
+        self.assertEqual(calculate._rank_candidates(np.array([np.nan, 2.0, np.nan, 1.0]), 3).tolist(), [3, 1])
+
+class TestBatchFitting(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        x = np.linspace(-20, 20, 400)
+        self.df_ideal = pd.DataFrame({'x': x, **{f'y{i}': rng.normal(size=400).cumsum() for i in range(1, 51)}})
+        self.train_datasets = {
+            f'train_{n}': pd.DataFrame({
+                'x': x,
+                **{f'y{i}': self.df_ideal[f'y{j}'] + rng.normal(scale=0.5, size=400) for i, j in enumerate(rng.integers(1, 51, 4), 1)}
+            })
+            for n in range(20)
+        }
+        # Exact duplicate of an ideal function
+        self.train_datasets['train_exact'] = pd.DataFrame({'x': x, 'y1': self.df_ideal['y5']})
+
+    def test_matches_individual_search(self):
+        results = calculate.calculate_best_fits_batch(self.train_datasets, self.df_ideal, block_size=16)
+        self.assertEqual(set(results), set(self.train_datasets))
+        for name, df_train in self.train_datasets.items():
+            expected = calculate.calculate_best_fits(df_train, self.df_ideal)
+            for col in expected:
+                self.assertEqual(results[name][col]['best_fit_col_ideal'], expected[col]['best_fit_col_ideal'])
+                self.assertAlmostEqual(results[name][col]['squared_diff'], expected[col]['squared_diff'])
+        self.assertEqual(results['train_exact']['y1']['squared_diff'], 0)
+
+class TestAlignToGrid(unittest.TestCase):
+    def setUp(self):
+        self.df_ideal = pd.DataFrame({
+            'x': [0.0, 1.0, 2.0, 3.0, 4.0],
+            'y1': [0.0, 2.0, 4.0, 6.0, 8.0],
+            'y2': [1.0, 1.0, 1.0, 1.0, 1.0]
+        })
+        self.df_train = pd.DataFrame({
+            'x': [3.5, 0.5, 2.0, 5.0],
+            'y1': [7.0, 1.0, 4.0, 10.0]
+        })
+
+    def test_interpolate_on_train_grid(self):
+        df_train, df_ideal = calculate.align_to_grid(self.df_train, self.df_ideal)
+        self.assertEqual(df_train['x'].tolist(), [0.5, 2.0, 3.5])
+        self.assertEqual(df_ideal['x'].tolist(), [0.5, 2.0, 3.5])
+        self.assertEqual(df_train['y1'].tolist(), [1.0, 4.0, 7.0])
+        self.assertEqual(df_ideal['y1'].tolist(), [1.0, 4.0, 7.0])
+        self.assertEqual(df_ideal['y2'].tolist(), [1.0, 1.0, 1.0])
+
+        best_fits = calculate.calculate_best_fits(df_train, df_ideal)
+        self.assertEqual(best_fits['y1']['best_fit_col_ideal'], 'y1')
+        self.assertEqual(best_fits['y1']['squared_diff'], 0)
+
+    def test_interpolate_on_ideal_grid(self):
+        df_train, df_ideal = calculate.align_to_grid(self.df_train, self.df_ideal, grid='ideal')
+        self.assertEqual(df_train['x'].tolist(), [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(df_train['y1'].tolist(), [2.0, 4.0, 6.0, 8.0])
+        self.assertEqual(df_ideal['y1'].tolist(), [2.0, 4.0, 6.0, 8.0])
+
+    def test_merge(self):
+        df_train, df_ideal = calculate.align_to_grid(self.df_train, self.df_ideal, method='merge')
+        self.assertEqual(df_train['x'].tolist(), [2.0])
+        self.assertEqual(df_ideal['y1'].tolist(), [4.0])
+
+    def test_mismatched_grids_are_rejected(self):
+        self.assertIsNone(calculate.calculate_best_fits(self.df_train, self.df_ideal.iloc[:4]))
+
+class TestUpdateIndividualTables(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.df_ideal = pd.DataFrame({
+            'x': [1, 2, 3, 4],
+            'y1': [2, 3, 4, 5],
+            'y2': [3, 4, 5, 6]
+        })
+        self.best_fits = {
+            'y1': {'best_fit_col_ideal': 'y1', 'squared_diff': 0, 'test_column': 'y1'},
+            'y2': {'best_fit_col_ideal': 'y2', 'squared_diff': 0, 'test_column': 'y2'}
+        }
+
+    def test_update_matches_full_run(self):
+        df_test = pd.DataFrame({'x': [4, 1, 3, 2], 'y': [6.5, 1.5, 4.5, 3.5]})
+        full = calculate.generate_individual_tables(self.df_ideal, df_test, self.best_fits, self.tmp_dir.name)
+
+        partial = calculate.generate_individual_tables(self.df_ideal, df_test.iloc[:2], self.best_fits, self.tmp_dir.name)
+        updated = calculate.update_individual_tables(partial, self.df_ideal, df_test.iloc[2:], self.best_fits, self.tmp_dir.name)
+
+        for key in full.keys():
+            pd.testing.assert_frame_equal(updated[key], full[key])
+        true_points = pd.read_csv(os.path.join(self.tmp_dir.name, 'True_Points_y2.csv'))
+        self.assertEqual(true_points['x'].tolist(), [2, 3, 4])
+
+    def test_reloaded_test_file_rebuilds_tables(self):
+        old_test = pd.DataFrame({'x': [1, 2], 'y': [2, 3]})
+        tables = calculate.generate_individual_tables(self.df_ideal, old_test, self.best_fits, self.tmp_dir.name)
+
+        # A rewritten test file is returned completely, flagged as reloaded
+        new_test = pd.DataFrame({'x': [1, 3], 'y': [9, 3]})
+        new_test.attrs['reloaded'] = True
+        updated = calculate.update_individual_tables(tables, self.df_ideal, new_test, self.best_fits, self.tmp_dir.name)
+
+        full = calculate.generate_individual_tables(self.df_ideal, new_test, self.best_fits, self.tmp_dir.name)
+        for key in full.keys():
+            pd.testing.assert_frame_equal(updated[key], full[key])
+        self.assertEqual(updated['y1']['test_y'].tolist(), [9, 3])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
 if __name__ == '__main__':
     unittest.main()
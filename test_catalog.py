@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+import pandas as pd
+import calculate
+from catalog import compact_catalog, expand_best_fits
+
+class TestCompactCatalog(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(9)
+        x = np.arange(50, dtype=float)
+        base = {f'y{i}': rng.normal(size=50) for i in range(1, 6)}
+        self.df_ideal = pd.DataFrame({
+            'x': x,
+            **base,
+            'y6': base['y2'],
+            'y7': base['y4'] + 1e-12,
+            'y8': base['y2'].copy()
+        })
+        self.df_train = pd.DataFrame({'x': x, 'y1': base['y2'] + 0.01, 'y2': base['y5'] - 0.01})
+
+    def test_exact_duplicates(self):
+        df_unique, equivalents = compact_catalog(self.df_ideal)
+        self.assertEqual(list(df_unique.columns), ['x', 'y1', 'y2', 'y3', 'y4', 'y5', 'y7'])
+        self.assertEqual(equivalents['y2'], ['y2', 'y6', 'y8'])
+        self.assertEqual(equivalents['y7'], ['y7'])
+
+    def test_near_duplicates(self):
+        df_unique, equivalents = compact_catalog(self.df_ideal, tolerance=1e-6)
+        self.assertNotIn('y7', df_unique.columns)
+        self.assertEqual(equivalents['y4'], ['y4', 'y7'])
+
+    def test_search_on_compacted_catalog(self):
+        expected = calculate.calculate_best_fits(self.df_train, self.df_ideal)
+        df_unique, equivalents = compact_catalog(self.df_ideal, tolerance=1e-6)
+        best_fits = calculate.calculate_best_fits(self.df_train, df_unique, equivalents=equivalents)
+        for col in expected:
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], expected[col]['best_fit_col_ideal'])
+        self.assertEqual(best_fits['y1']['equivalent_columns'], ['y2', 'y6', 'y8'])
+        self.assertEqual(best_fits['y2']['equivalent_columns'], ['y5'])
+
+    def test_near_duplicates_are_approximate(self):
+        # y7 fits y3 of the training data better than its representative y4
+        df_train = pd.DataFrame({'x': self.df_ideal['x'], 'y3': self.df_ideal['y7'] + 1e-12})
+        tolerance = 1e-6
+        expected = calculate.calculate_least_square(df_train, self.df_ideal)
+        df_unique, equivalents = compact_catalog(self.df_ideal, tolerance=tolerance)
+        best_fits = calculate.calculate_best_fits(df_train, df_unique, equivalents=equivalents)
+        self.assertEqual(expected['y3']['best_fit_col_ideal'], 'y7')
+        self.assertEqual(best_fits['y3']['best_fit_col_ideal'], 'y4')
+        self.assertIn('y7', best_fits['y3']['equivalent_columns'])
+
+        # The error of the representative stays within tolerance * sqrt(number of rows)
+        difference = np.sqrt(best_fits['y3']['squared_diff']) - np.sqrt(expected['y3']['squared_diff'])
+        self.assertLessEqual(difference, tolerance * np.sqrt(len(self.df_ideal)))
+
+    def test_expand_unknown_representative(self):
+        best_fits = expand_best_fits({'y1': {'best_fit_col_ideal': 'y9'}}, {})
+        self.assertEqual(best_fits['y1']['equivalent_columns'], ['y9'])
+
+    def test_negative_tolerance(self):
+        with self.assertRaises(ValueError):
+            compact_catalog(self.df_ideal, tolerance=-1)
+
+if __name__ == '__main__':
+    unittest.main()
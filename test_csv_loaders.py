@@ -1,4 +1,10 @@
+import multiprocessing
+import os
+import tempfile
 import unittest
+import numpy as np
+from unittest.mock import patch
+import calculate
 from csvloader import CSVLoader1, CSVLoader2, CSVLoader3
 
 class TestCSVLoaders(unittest.TestCase):
@@ -35,5 +41,303 @@ class TestCSVLoaders(unittest.TestCase):
         self.loader2.conn.close()
         self.loader3.conn.close()
 
+class TestCSVLoaderQueries(unittest.TestCase):
+    def setUp(self):
+        # Load a small CSV file into a temporary database
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.tmp_dir.name, 'query.db')
+        self.csv_file = os.path.join(self.tmp_dir.name, 'train.csv')
+        with open(self.csv_file, 'w') as file:
+            file.write('x,y1,y2,y3,y4\n')
+            for x in range(10):
+                file.write(f'{x}.0,{x + 1}.0,{x + 2}.0,{x + 3}.0,{x + 4}.0\n')
+        self.loader = CSVLoader1(database_file=self.database_file, table_name='train')
+        self.loader.process_data(self.csv_file)
+
+    def test_index_on_x(self):
+        indexes = self.loader.engine.execute("PRAGMA index_list('train')").fetchall()
+        self.assertIn('ix_train_x', [row[1] for row in indexes])
+
+    def test_query_points(self):
+        df = self.loader.query_points([7.0, 2.0, 42.0, 2.0], columns=['y2'])
+        self.assertEqual(list(df.columns), ['x', 'y2'])
+        self.assertEqual(df['x'].tolist(), [2.0, 7.0])
+        self.assertEqual(df['y2'].tolist(), [4.0, 9.0])
+
+    def test_query_points_chunked(self):
+        self.loader.query_chunk_size = 3
+        df = self.loader.query_points(range(10))
+        self.assertEqual(df['x'].tolist(), [float(x) for x in range(10)])
+        self.assertEqual(list(df.columns), ['x', 'y1', 'y2', 'y3', 'y4'])
+
+    def test_load_dataframe_compact(self):
+        df = self.loader.load_dataframe(self.csv_file, compact=True)
+        self.assertEqual(df['x'].dtype, 'float64')
+        self.assertTrue(all(df[column].dtype == 'float32' for column in ['y1', 'y2', 'y3', 'y4']))
+
+    def test_query_range(self):
+        df = self.loader.query_range(3.0, 5.0, columns=['y4'])
+        self.assertEqual(df['x'].tolist(), [3.0, 4.0, 5.0])
+        self.assertEqual(df['y4'].tolist(), [7.0, 8.0, 9.0])
+
+    def tearDown(self):
+        self.loader.engine.dispose()
+        self.tmp_dir.cleanup()
+
+class TestIncrementalIngestion(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.tmp_dir.name, 'incremental.db')
+        self.csv_file = os.path.join(self.tmp_dir.name, 'test.csv')
+        with open(self.csv_file, 'w') as file:
+            file.write('x,y\n1.0,2.0\n2.0,3.0\n')
+        self.loader = CSVLoader2(database_file=self.database_file, table_name='test')
+
+    def row_count(self):
+        return self.loader.engine.execute('SELECT COUNT(*) FROM test').scalar()
+
+    def test_only_new_tail_is_loaded(self):
+        first = self.loader.process_data(self.csv_file, incremental=True)
+        self.assertEqual(first['x'].tolist(), [1.0, 2.0])
+        self.assertEqual(list(first.columns), ['x', 'y'])
+
+        with open(self.csv_file, 'a') as file:
+            file.write('3.0,4.0\n4.0,')
+        second = self.loader.process_data(self.csv_file, incremental=True)
+        self.assertEqual(second['x'].tolist(), [3.0])
+        self.assertFalse(second.attrs['reloaded'])
+        self.assertEqual(second.attrs['start_row'], 2)
+
+        # The incomplete trailing line is loaded once it has been finished
+        with open(self.csv_file, 'a') as file:
+            file.write('5.0\n')
+        third = self.loader.process_data(self.csv_file, incremental=True)
+        self.assertEqual(third['y'].tolist(), [5.0])
+        self.assertEqual(self.row_count(), 4)
+
+        self.assertTrue(self.loader.process_data(self.csv_file, incremental=True).empty)
+
+    def test_table_loaded_without_state(self):
+        self.loader.process_data(self.csv_file)
+        with open(self.csv_file, 'a') as file:
+            file.write('3.0,4.0\n')
+        new_rows = self.loader.process_data(self.csv_file, incremental=True)
+        self.assertEqual(new_rows['x'].tolist(), [3.0])
+        self.assertEqual(self.row_count(), 3)
+
+    def test_rewritten_file_is_reloaded(self):
+        self.loader.process_data(self.csv_file, incremental=True)
+        with open(self.csv_file, 'w') as file:
+            file.write('x,y\n9.0,9.0\n')
+        new_rows = self.loader.process_data(self.csv_file, incremental=True)
+        self.assertEqual(new_rows['x'].tolist(), [9.0])
+        self.assertEqual(self.row_count(), 1)
+        self.assertTrue(new_rows.attrs['reloaded'])
+        self.assertEqual(new_rows.attrs['start_row'], 0)
+
+    def test_rewritten_file_of_same_or_larger_size_is_reloaded(self):
+        self.loader.process_data(self.csv_file, incremental=True)
+
+        # Same size, different content
+        with open(self.csv_file, 'w') as file:
+            file.write('x,y\n7.0,8.0\n8.0,9.0\n')
+        new_rows = self.loader.process_data(self.csv_file, incremental=True)
+        self.assertEqual(new_rows['x'].tolist(), [7.0, 8.0])
+        self.assertEqual(self.row_count(), 2)
+
+        # Longer file whose old offset lands inside a line
+        with open(self.csv_file, 'w') as file:
+            file.write('x,y\n10.0,20.0\n30.0,40.0\n50.0,60.0\n')
+        new_rows = self.loader.process_data(self.csv_file, incremental=True)
+        self.assertEqual(new_rows['x'].tolist(), [10.0, 30.0, 50.0])
+        self.assertEqual(self.row_count(), 3)
+
+    def test_state_without_prefix_hash(self):
+        # ingest_state tables of older versions have no prefix_hash column
+        with self.loader.engine.connect() as conn:
+            conn.execute('DROP TABLE ingest_state')
+            conn.execute('CREATE TABLE ingest_state (source VARCHAR, table_name VARCHAR, byte_offset INTEGER, row_count INTEGER, '
+                         'PRIMARY KEY (source, table_name))')
+        self.loader.process_data(self.csv_file, incremental=True)
+        with open(self.csv_file, 'a') as file:
+            file.write('3.0,4.0\n')
+        new_rows = self.loader.process_data(self.csv_file, incremental=True)
+        self.assertEqual(new_rows['x'].tolist(), [3.0])
+        self.assertEqual(self.row_count(), 3)
+
+    def tearDown(self):
+        self.loader.engine.dispose()
+        self.tmp_dir.cleanup()
+
+class TestIdealStatistics(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.tmp_dir.name, 'ideal.db')
+        self.csv_file = os.path.join(self.tmp_dir.name, 'ideal.csv')
+        rng = np.random.default_rng(8)
+        self.values = rng.normal(size=(30, 50))
+        with open(self.csv_file, 'w') as file:
+            file.write('x,' + ','.join(f'y{i}' for i in range(1, 51)) + '\n')
+            for x in range(29, -1, -1):
+                file.write(f'{x}.0,' + ','.join(repr(float(v)) for v in self.values[x]) + '\n')
+        self.loader = CSVLoader3(database_file=self.database_file, table_name='ideal')
+
+    def test_statistics_after_ingestion(self):
+        self.loader.process_data(self.csv_file)
+        stats = self.loader.column_stats()
+        self.assertEqual(stats['columns'], [f'y{i}' for i in range(1, 51)])
+        self.assertEqual(stats['n_rows'], 30)
+        np.testing.assert_allclose(stats['sums'], self.values.sum(axis=0))
+        np.testing.assert_allclose(stats['norms'], np.linalg.norm(self.values, axis=0))
+        np.testing.assert_allclose(stats['means'], self.values.mean(axis=0))
+        np.testing.assert_array_equal(stats['min'], self.values.min(axis=0))
+        np.testing.assert_array_equal(stats['max'], self.values.max(axis=0))
+        self.assertEqual(stats['x'].tolist(), [float(x) for x in range(30)])
+
+    def test_stale_statistics_are_recomputed(self):
+        self.loader.process_data(self.csv_file, incremental=True)
+        self.loader.engine.execute('DELETE FROM ideal WHERE x >= 20')
+        self.assertEqual(self.loader.column_stats()['n_rows'], 20)
+
+    def test_statistics_feed_the_search(self):
+        self.loader.process_data(self.csv_file)
+        stats = self.loader.column_stats()
+        df_ideal = self.loader.load_dataframe(self.csv_file).sort_values(by='x').reset_index(drop=True)
+        df_train = df_ideal[['x', 'y7', 'y21']].rename(columns={'y7': 'y1', 'y21': 'y2'})
+        df_train[['y1', 'y2']] += 0.01
+
+        pruned = calculate.calculate_best_fits_pruned(df_train, df_ideal, ideal_stats=stats)
+        batch = calculate.calculate_best_fits_batch({'train': df_train}, df_ideal, ideal_stats=stats)
+        self.assertEqual([fit['best_fit_col_ideal'] for fit in pruned.values()], ['y7', 'y21'])
+        self.assertEqual([fit['best_fit_col_ideal'] for fit in batch['train'].values()], ['y7', 'y21'])
+
+    def test_unchanged_table_is_not_written(self):
+        self.loader.process_data(self.csv_file)
+        with open(self.database_file, 'rb') as file:
+            content = file.read()
+
+        loader = CSVLoader3(database_file=self.database_file, table_name='ideal')
+        with patch.object(loader, 'update_statistics') as mock_update:
+            loader.process_data(self.csv_file)
+        mock_update.assert_not_called()
+        loader.process_data(self.csv_file)
+        loader.engine.dispose()
+        with open(self.database_file, 'rb') as file:
+            self.assertEqual(file.read(), content)
+
+    def test_statistics_of_rewritten_csv_file(self):
+        self.loader.process_data(self.csv_file, incremental=True)
+        stats = self.loader.column_stats(self.csv_file)
+        self.assertIsNotNone(stats['source_hash'])
+
+        # Regenerate the CSV file with the same shape and x values
+        values = np.random.default_rng(9).normal(size=(30, 50))
+        with open(self.csv_file, 'w') as file:
+            file.write('x,' + ','.join(f'y{i}' for i in range(1, 51)) + '\n')
+            for x in range(30):
+                file.write(f'{x}.0,' + ','.join(repr(float(v)) for v in values[x]) + '\n')
+        with self.assertRaises(ValueError):
+            self.loader.column_stats(self.csv_file)
+
+        self.loader.process_data(self.csv_file, incremental=True)
+        stats = self.loader.column_stats(self.csv_file)
+        np.testing.assert_allclose(stats['sum_sq'], (values ** 2).sum(axis=0))
+
+    def test_statistics_without_source_hash(self):
+        # Tables and statistics stored before the source was tracked
+        self.loader.process_data(self.csv_file)
+        self.loader.update_statistics()
+        with self.assertRaises(ValueError):
+            self.loader.column_stats(self.csv_file)
+
+        self.assertTrue(self.loader.process_data(self.csv_file, incremental=True).empty)
+        self.assertIsNotNone(self.loader.column_stats(self.csv_file)['source_hash'])
+
+    def test_statistics_of_other_dataset_are_rejected(self):
+        self.loader.process_data(self.csv_file)
+        stats = self.loader.column_stats()
+        df_ideal = self.loader.load_dataframe(self.csv_file).sort_values(by='x').reset_index(drop=True)
+        df_train = df_ideal[['x', 'y7']]
+        self.assertIsNone(calculate.calculate_best_fits_batch({'train': df_train.iloc[:20]}, df_ideal.iloc[:20], ideal_stats=stats))
+
+        df_shifted = df_ideal.assign(x=df_ideal['x'] + 0.5)
+        self.assertIsNone(calculate.calculate_best_fits_pruned(df_shifted[['x', 'y7']], df_shifted, ideal_stats=stats))
+
+    def test_load_catalog(self):
+        df_unique, equivalents = self.loader.load_catalog(self.csv_file)
+        self.assertEqual(len(df_unique.columns), 51)
+        self.assertEqual(equivalents['y1'], ['y1'])
+
+    def tearDown(self):
+        self.loader.engine.dispose()
+        self.tmp_dir.cleanup()
+
+def _read_ideal(database_file):
+    # Runs in a worker process
+    loader = CSVLoader3(database_file=database_file, table_name='ideal', read_only=True)
+    return loader.query_range(2.0, 4.0, columns=['y1'])['y1'].tolist(), loader.column_stats()['n_rows']
+
+class TestReadOnlyMode(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.tmp_dir.name, 'readonly.db')
+        self.csv_file = os.path.join(self.tmp_dir.name, 'ideal.csv')
+        with open(self.csv_file, 'w') as file:
+            file.write('x,' + ','.join(f'y{i}' for i in range(1, 51)) + '\n')
+            for x in range(6):
+                file.write(f'{x}.0,' + ','.join(f'{x * i}.0' for i in range(1, 51)) + '\n')
+        writer = CSVLoader3(database_file=self.database_file, table_name='ideal')
+        writer.process_data(self.csv_file)
+        writer.enable_wal()
+        writer.engine.dispose()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_only_connection(self):
+        loader = CSVLoader3(database_file=self.database_file, table_name='ideal', read_only=True)
+        self.assertTrue(loader.read_only)
+        self.assertEqual(loader.conn.execute('PRAGMA mmap_size').scalar(), CSVLoader3.mmap_size)
+        self.assertEqual(loader.conn.execute('PRAGMA journal_mode').scalar(), 'wal')
+        self.assertEqual(loader.query_points([1.0, 3.0], columns=['y2'])['y2'].tolist(), [2.0, 6.0])
+
+    def test_writes_are_rejected(self):
+        loader = CSVLoader3(database_file=self.database_file, table_name='ideal', read_only=True)
+        for write in (lambda: loader.process_data(self.csv_file), lambda: loader.process_new_rows(self.csv_file),
+                      loader.update_statistics, loader.enable_wal):
+            with self.assertRaises(ValueError):
+                write()
+
+    def test_no_ddl_on_construction(self):
+        # A writable loader would create the missing table and its index
+        loader = CSVLoader2(database_file=self.database_file, table_name='missing', read_only=True)
+        self.assertFalse(loader.engine.dialect.has_table(loader.engine, 'missing'))
+
+    def test_column_stats_without_stored_statistics(self):
+        with CSVLoader3(database_file=self.database_file, table_name='ideal').engine.begin() as conn:
+            conn.execute('DROP TABLE ideal_stats')
+        loader = CSVLoader3(database_file=self.database_file, table_name='ideal', read_only=True)
+        stats = loader.column_stats()
+        self.assertEqual(stats['n_rows'], 6)
+        self.assertEqual(stats['sums'][1], 30.0)
+        self.assertFalse(loader.engine.dialect.has_table(loader.engine, 'ideal_stats'))
+
+    def test_reads_during_write_transaction(self):
+        writer = CSVLoader3(database_file=self.database_file, table_name='ideal')
+        conn = writer.engine.connect()
+        transaction = conn.begin()
+        conn.execute(writer.data_table.insert().values(x=9.0, **{f'y{i}': 0.0 for i in range(1, 51)}))
+
+        loader = CSVLoader3(database_file=self.database_file, table_name='ideal', read_only=True)
+        self.assertEqual(len(loader.query_range(0.0, 10.0)), 6)
+        transaction.commit()
+        conn.close()
+        self.assertEqual(len(loader.query_range(0.0, 10.0)), 7)
+
+    def test_concurrent_worker_processes(self):
+        with multiprocessing.get_context('spawn').Pool(4) as pool:
+            results = pool.map(_read_ideal, [self.database_file] * 8)
+        self.assertEqual(results, [([2.0, 3.0, 4.0], 6)] * 8)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,99 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import calculate
+import equivalence
+import kernels
+
+class TestEquivalence(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_harness(self, **kwargs):
+        datasets = equivalence.generate_datasets(**kwargs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return equivalence.run_equivalence(*datasets, self.tmp_dir.name)
+
+    def test_generate_datasets(self):
+        df_train, df_ideal, df_test = equivalence.generate_datasets(seed=0, n_rows=50, n_train=3, n_ideal=10, n_test=20, nans=True)
+        self.assertEqual(list(df_train.columns), ['x', 'y1', 'y2', 'y3'])
+        self.assertEqual(df_ideal.shape, (50, 11))
+        self.assertEqual(len(df_test), 20)
+        self.assertTrue(df_ideal.isna().any().any())
+        self.assertTrue(df_train.isna().any().any())
+        self.assertTrue(df_test['x'].isin(df_ideal['x']).all())
+
+    def test_tied_groups_are_larger_than_k(self):
+        df_train, df_ideal, _ = equivalence.generate_datasets(seed=0, n_rows=50, n_ideal=30)
+        functions = df_ideal.iloc[:, 1:].T
+        self.assertGreaterEqual(functions.groupby(list(functions.columns)).size().max(), 4)
+
+    def test_ties(self):
+        report = self.run_harness(seed=1, ties=True)
+        self.assertEqual(report['mismatches'], [])
+
+    def test_nans(self):
+        for seed in range(3):
+            report = self.run_harness(seed=seed, nans=True)
+            self.assertEqual(report['mismatches'], [])
+
+    def test_off_grid(self):
+        report = self.run_harness(seed=2, off_grid=True)
+        self.assertEqual(report['mismatches'], [])
+
+    def test_wide_catalog(self):
+        report = self.run_harness(seed=3, n_rows=200, n_ideal=600, nans=True)
+        self.assertEqual(report['mismatches'], [])
+
+    def test_timings(self):
+        report = self.run_harness(seed=4, n_rows=100, n_ideal=20)
+        expected = ['reference', 'vectorized', 'chunked', 'pruned', 'multires', 'top_k', 'fit_state', 'mapping_reference', 'mapping_compact',
+                    'mapping_service', 'mapping_incremental']
+        if 'numba' in kernels.available_backends():
+            expected.append('parallel')
+        self.assertCountEqual(report['timings'], expected)
+        self.assertTrue(all(np.isfinite(seconds) and seconds >= 0 for seconds in report['timings'].values()))
+
+    def test_detects_unstable_tie_breaking(self):
+        def rank_candidates(squared_diffs, k):
+            # argpartition alone keeps an arbitrary member of a tied group at the boundary
+            candidates = np.argpartition(squared_diffs, k - 1)[:k]
+            return candidates[np.lexsort((candidates, squared_diffs[candidates]))]
+
+        with patch.object(calculate, '_rank_candidates', rank_candidates):
+            mismatches = [
+                mismatch
+                for seed in range(10)
+                for mismatch in self.run_harness(seed=seed, n_rows=100, n_ideal=40)['mismatches']
+            ]
+        self.assertTrue(mismatches)
+        self.assertTrue(all(mismatch.startswith(('top_k:', 'multires:')) for mismatch in mismatches))
+
+    def test_detects_mismatch(self):
+        datasets = equivalence.generate_datasets(seed=5, n_rows=100, n_ideal=20)
+        broken = dict(equivalence._backends(), vectorized=lambda df_train, df_ideal: {
+            col: {'best_fit_col_ideal': 'y0', 'squared_diff': 0.0, 'test_column': col} for col in df_train.columns[1:]
+        })
+        with patch.object(equivalence, '_backends', return_value=broken), contextlib.redirect_stdout(io.StringIO()):
+            report = equivalence.run_equivalence(*datasets, self.tmp_dir.name)
+        self.assertEqual(len(report['mismatches']), 4)
+        self.assertTrue(all(mismatch.startswith('vectorized:') for mismatch in report['mismatches']))
+
+    def test_detects_mapping_mismatch(self):
+        datasets = equivalence.generate_datasets(seed=6, n_rows=100, n_ideal=20)
+        # The service drops all points, the update keeps the tables of the first half of the test points
+        with patch.object(equivalence, '_service_tables', return_value={}), \
+                patch.object(calculate, 'update_individual_tables', side_effect=lambda tables, *args: tables), \
+                contextlib.redirect_stdout(io.StringIO()):
+            report = equivalence.run_equivalence(*datasets, self.tmp_dir.name)
+        self.assertEqual(len(report['mismatches']), 8)
+        self.assertCountEqual({mismatch.split(':')[0] for mismatch in report['mismatches']}, ['mapping_service', 'mapping_incremental'])
+
+if __name__ == '__main__':
+    unittest.main()
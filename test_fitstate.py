@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import calculate
+from fitstate import FitState, update_best_fits
+
+class TestFitState(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        x = np.arange(20, dtype=float)
+        self.df_ideal = pd.DataFrame({'x': x, **{f'y{i}': rng.normal(size=20) for i in range(1, 8)}})
+        self.df_train = pd.DataFrame({
+            'x': x,
+            'y1': self.df_ideal['y3'] + rng.normal(scale=0.1, size=20),
+            'y2': self.df_ideal['y6'] + rng.normal(scale=0.1, size=20)
+        })
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def test_matches_full_search(self):
+        expected = calculate.calculate_least_square(self.df_train, self.df_ideal)
+        best_fits = FitState.from_dataframes(self.df_train, self.df_ideal).best_fits()
+        for col in expected:
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], expected[col]['best_fit_col_ideal'])
+            self.assertAlmostEqual(best_fits[col]['squared_diff'], expected[col]['squared_diff'])
+
+    def test_incremental_updates(self):
+        state_file = os.path.join(self.tmp_dir.name, 'fit_state.npz')
+        update_best_fits(state_file, self.df_train.iloc[:7], self.df_ideal)
+        update_best_fits(state_file, self.df_train.iloc[7:15], self.df_ideal)
+        best_fits = update_best_fits(state_file, self.df_train.iloc[15:], self.df_ideal)
+
+        state = FitState.load(state_file)
+        full = FitState.from_dataframes(self.df_train, self.df_ideal)
+        self.assertEqual(state.n_rows, 20)
+        np.testing.assert_allclose(state.squared_diffs(), full.squared_diffs())
+        for col, fit_info in full.best_fits().items():
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], fit_info['best_fit_col_ideal'])
+            self.assertAlmostEqual(best_fits[col]['squared_diff'], fit_info['squared_diff'])
+
+    def test_large_offset(self):
+        # Unshifted sums of values around 1e6 cancel and hide differences of 1e-3
+        rng = np.random.default_rng(1)
+        x = np.arange(200, dtype=float)
+        ideal = 1e6 + rng.normal(scale=1e-2, size=(200, 15))
+        df_ideal = pd.DataFrame(ideal, columns=[f'y{i}' for i in range(1, 16)])
+        df_ideal.insert(0, 'x', x)
+        df_train = pd.DataFrame({
+            'x': x,
+            'y1': ideal[:, 11] + rng.normal(scale=1e-3, size=200),
+            'y2': ideal[:, 6] + rng.normal(scale=1e-3, size=200)
+        })
+
+        expected = calculate.calculate_least_square(df_train, df_ideal)
+        state = FitState(df_train.columns[1:], df_ideal.columns[1:])
+        for start in range(0, 200, 50):
+            state.update(df_train.iloc[start:start + 50], df_ideal, start_row=start)
+        best_fits = state.best_fits()
+        for col in expected:
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], expected[col]['best_fit_col_ideal'])
+            self.assertAlmostEqual(best_fits[col]['squared_diff'], expected[col]['squared_diff'], places=12)
+
+    def test_rows_applied_twice_are_rejected(self):
+        state_file = os.path.join(self.tmp_dir.name, 'fit_state.npz')
+        update_best_fits(state_file, self.df_train.iloc[:10], self.df_ideal, start_row=0)
+        update_best_fits(state_file, self.df_train.iloc[10:], self.df_ideal, start_row=10)
+        with self.assertRaises(ValueError):
+            update_best_fits(state_file, self.df_train.iloc[10:], self.df_ideal, start_row=10)
+        self.assertEqual(FitState.load(state_file).n_rows, 20)
+
+    def test_reloaded_rows_rebuild_the_state(self):
+        state_file = os.path.join(self.tmp_dir.name, 'fit_state.npz')
+        update_best_fits(state_file, self.df_train.iloc[:10], self.df_ideal)
+
+        # BaseCSVLoader.process_new_rows marks the complete content of a rewritten file with start_row 0
+        df_reloaded = self.df_train.iloc[5:].copy()
+        df_reloaded.attrs['start_row'] = 0
+        best_fits = update_best_fits(state_file, df_reloaded, self.df_ideal)
+
+        expected = FitState.from_dataframes(self.df_train.iloc[5:], self.df_ideal)
+        self.assertEqual(FitState.load(state_file).n_rows, 15)
+        for col, fit_info in expected.best_fits().items():
+            self.assertEqual(best_fits[col]['best_fit_col_ideal'], fit_info['best_fit_col_ideal'])
+            self.assertAlmostEqual(best_fits[col]['squared_diff'], fit_info['squared_diff'])
+
+    def test_load_state_of_older_version(self):
+        state_file = os.path.join(self.tmp_dir.name, 'fit_state.npz')
+        train_rows = self.df_train[['y1', 'y2']].to_numpy()
+        ideal_rows = self.df_ideal.iloc[:, 1:].to_numpy()
+        np.savez(
+            state_file,
+            train_columns=np.array(['y1', 'y2']),
+            ideal_columns=np.array(list(self.df_ideal.columns[1:])),
+            n_rows=20,
+            sum_train_sq=(train_rows ** 2).sum(axis=0),
+            sum_ideal_sq=(ideal_rows ** 2).sum(axis=0),
+            sum_cross=train_rows.T @ ideal_rows
+        )
+        full = FitState.from_dataframes(self.df_train, self.df_ideal)
+        np.testing.assert_allclose(FitState.load(state_file).squared_diffs(), full.squared_diffs())
+
+    def test_mismatched_columns(self):
+        state = FitState(['y1'], ['y1', 'y2'])
+        with self.assertRaises(ValueError):
+            state.update(self.df_train, self.df_ideal)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+import kernels
+
+class TestKernels(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.ideal = rng.normal(size=(300, 40))
+        self.train = self.ideal[:, [3, 17]] + rng.normal(scale=0.1, size=(300, 2))
+
+    def check_backend(self, backend):
+        squared_diffs, max_deviations, best = kernels.fused_score(self.train, self.ideal, backend)
+        diff = self.ideal[:, None, :] - self.train[:, :, None]
+        np.testing.assert_allclose(squared_diffs, (diff ** 2).sum(axis=0))
+        np.testing.assert_allclose(max_deviations, np.abs(diff).max(axis=0))
+        self.assertEqual(best.tolist(), [3, 17])
+
+    def test_numpy_backend(self):
+        self.check_backend('numpy')
+
+    @unittest.skipUnless(kernels.numba is not None, "numba is not installed")
+    def test_numba_backend(self):
+        self.check_backend('numba')
+
+    def test_auto_backend(self):
+        self.assertEqual(kernels.select_backend('auto'), kernels.available_backends()[0])
+        self.assertIn('numpy', kernels.available_backends())
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            kernels.select_backend('cuda')
+
+    def test_nan_columns_are_ignored(self):
+        ideal = self.ideal.copy()
+        ideal[5, 3] = np.nan
+        squared_diffs, max_deviations, best = kernels.fused_score(self.train, ideal, 'numpy')
+        self.assertTrue(np.isnan(squared_diffs[0, 3]))
+        self.assertNotEqual(best[0], 3)
+        self.assertEqual(kernels.best_index(np.array([np.nan, np.nan])), -1)
+
+if __name__ == '__main__':
+    unittest.main()
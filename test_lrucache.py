@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+import unittest
+from lrucache import LRUDirectoryCache
+
+class TextCache(LRUDirectoryCache):
+    suffix = '.txt'
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as file:
+                content = file.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self._touch(key)
+        return content
+
+    def put(self, key, content):
+        self._store(key, lambda file: file.write(content.encode()))
+
+class TestLRUDirectoryCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = TextCache(self.tmp_dir.name, max_bytes=25)
+
+    def test_store_and_read(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', 'content')
+        self.assertEqual(self.cache.get('a'), 'content')
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'entries': 1, 'bytes': 7})
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['a.txt'])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for key in ('a', 'b'):
+            self.cache.put(key, 'x' * 10)
+            time.sleep(0.01)
+        # Reading 'a' makes 'b' the least recently used entry
+        self.cache.get('a')
+        time.sleep(0.01)
+        self.cache.put('c', 'x' * 10)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['a.txt', 'c.txt'])
+
+    def test_entry_larger_than_the_cache_is_kept(self):
+        self.cache.put('a', 'x' * 100)
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_failed_write_leaves_no_file(self):
+        def write(file):
+            raise OSError("disk full")
+        with self.assertRaises(OSError):
+            self.cache._store('a', write)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
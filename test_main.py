@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 import main  
 
 class TestMainScript(unittest.TestCase):
@@ -41,11 +41,16 @@ class TestMainScript(unittest.TestCase):
             csv_loader_mock_instance.load_dataframe.assert_called_once_with("test.csv")
 
     def test_main(self):
-        # Mock the functions and dataframes
-        main.load_data = MagicMock(side_effect=[1, 2, 3])  # Mock the load_data function to return values
-        main.calculate.calculate_least_square = MagicMock(return_value={'mock_result': 'mock_value'})
-        main.calculate.generate_individual_tables = MagicMock(return_value={'mock_individual_tables': 'mock_value'})
-        main.visio.ResultVisualizer = MagicMock()  # Mock the ResultVisualizer class
+        # Mock the functions and dataframes, the originals are restored after the test
+        patches = [
+            patch.object(main, 'load_data', MagicMock(side_effect=[1, 2, 3]), create=True),  # Mock the load_data function to return values
+            patch.object(main.calculate, 'calculate_least_square', MagicMock(return_value={'mock_result': 'mock_value'})),
+            patch.object(main.calculate, 'generate_individual_tables', MagicMock(return_value={'mock_individual_tables': 'mock_value'})),
+            patch.object(main.visio, 'ResultVisualizer', MagicMock())  # Mock the ResultVisualizer class
+        ]
+        for mock_patch in patches:
+            mock_patch.start()
+            self.addCleanup(mock_patch.stop)
 
         # Call main function
         main.main()
@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from pipeline import Pipeline, StageCache
+from main import CustomError
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = self.tmp_dir.name
+        x = np.arange(20, dtype=float)
+        pd.DataFrame({'x': x, 'y1': x, 'y2': x ** 2, 'y3': -x}).to_csv(self.path('ideal.csv'), index=False)
+        pd.DataFrame({'x': x, 'y1': x + 0.1, 'y2': -x - 0.1}).to_csv(self.path('train.csv'), index=False)
+        pd.DataFrame({'x': [1.0, 5.0], 'y': [1.2, -5.0]}).to_csv(self.path('test.csv'), index=False)
+        self.cache = StageCache(self.path('cache'))
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def run_pipeline(self):
+        pipeline = Pipeline(self.cache, output_dir=self.dir)
+        result = pipeline.run(self.path('train.csv'), self.path('test.csv'), self.path('ideal.csv'))
+        return pipeline, result
+
+    def test_unchanged_inputs_are_cached(self):
+        pipeline, first = self.run_pipeline()
+        self.assertEqual(pipeline.executed, ['fit', 'map', 'plot'])
+        self.assertEqual(len(first['figures']), 4)
+
+        pipeline, second = self.run_pipeline()
+        self.assertEqual(pipeline.executed, [])
+        self.assertEqual(second['best_fits'], first['best_fits'])
+        self.assertTrue(all(os.path.exists(path) for path in second['figures']))
+        self.assertTrue(os.path.exists(self.path('True_Points_y3.csv')))
+
+    def test_new_test_file_only_reruns_map_and_plot(self):
+        self.run_pipeline()
+        pd.DataFrame({'x': [2.0], 'y': [2.0]}).to_csv(self.path('test.csv'), index=False)
+        pipeline, result = self.run_pipeline()
+        self.assertEqual(pipeline.executed, ['map', 'plot'])
+        self.assertEqual(result['individual_tables']['y1']['x'].tolist(), [2.0])
+
+    def test_failed_stage_is_not_cached(self):
+        # The training data has fewer rows than the ideal data, so the fit stage fails
+        pd.DataFrame({'x': [0.0, 1.0], 'y1': [0.0, 1.0]}).to_csv(self.path('train.csv'), index=False)
+        for _ in range(2):
+            pipeline = Pipeline(self.cache, output_dir=self.dir)
+            with self.assertRaises(CustomError):
+                pipeline.run(self.path('train.csv'), self.path('test.csv'), self.path('ideal.csv'))
+            self.assertEqual(pipeline.executed, ['fit'])
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_incompatible_entry_is_a_miss(self):
+        pipeline, first = self.run_pipeline()
+        fit_key = self.cache.key('fit', [self.path('train.csv'), self.path('ideal.csv')], {})
+
+        # Pickles referring to classes that don't exist in the installed library versions
+        for content in (b'cpipeline\nNoSuchClass\n.', b'cno_such_module\nNoSuchClass\n.'):
+            with open(self.cache._path(fit_key), 'wb') as file:
+                file.write(content)
+            pipeline, result = self.run_pipeline()
+            self.assertEqual(pipeline.executed, ['fit'])
+            self.assertEqual(result['best_fits'], first['best_fits'])
+
+    def test_load_stage(self):
+        database_file = self.path('pipeline.db')
+        x = np.arange(4, dtype=float)
+        pd.DataFrame({'x': x, **{f'y{i}': x * i for i in range(1, 51)}}).to_csv(self.path('ideal.csv'), index=False)
+        pd.DataFrame({'x': x, **{f'y{i}': x * i + 0.1 for i in range(1, 5)}}).to_csv(self.path('train.csv'), index=False)
+        pd.DataFrame({'x': [1.0, 3.0], 'y': [1.2, 2.0]}).to_csv(self.path('test.csv'), index=False)
+
+        def run():
+            pipeline = Pipeline(self.cache, output_dir=self.dir, database_file=database_file)
+            pipeline.run(self.path('train.csv'), self.path('test.csv'), self.path('ideal.csv'))
+            return pipeline.executed
+
+        self.assertEqual(run(), ['load', 'fit', 'map', 'plot'])
+        self.assertEqual(run(), [])
+        with open(self.path('test.csv'), 'a') as file:
+            file.write('2.0,2.5\n')
+        self.assertEqual(run(), ['load', 'map', 'plot'])
+
+        with sqlite3.connect(database_file) as conn:
+            counts = [conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in ('train', 'test', 'ideal')]
+        self.assertEqual(counts, [4, 3, 4])
+
+    def test_lru_eviction(self):
+        cache = StageCache(self.path('small_cache'), max_bytes=1500)
+        for idx in range(5):
+            cache.put(cache.key('stage', params={'idx': idx}), b'x' * 1000)
+        entries = [name for name in os.listdir(self.path('small_cache')) if name.endswith('.pkl')]
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(cache.get(cache.key('stage', params={'idx': 4}))[0])
+        self.assertFalse(cache.get(cache.key('stage', params={'idx': 0}))[0])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
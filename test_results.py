@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+import calculate
+from results import MappingResult
+from visio import ResultVisualizer
+
+class TestMappingResult(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.df_ideal = pd.DataFrame({
+            'x': [1.0, 2.0, 3.0, 4.0],
+            'y1': [2.0, 3.0, 4.0, 5.0],
+            'y2': [3.0, 4.0, 5.0, 6.0]
+        })
+        self.df_test = pd.DataFrame({
+            'x': [4.0, 1.0, 3.0, 2.0],
+            'y': [6.5, 1.5, 4.5, 9.0]
+        })
+        self.best_fits = {
+            'y1': {'best_fit_col_ideal': 'y1', 'squared_diff': 0, 'test_column': 'y1'},
+            'y2': {'best_fit_col_ideal': 'y2', 'squared_diff': 0, 'test_column': 'y2'}
+        }
+
+    def test_compact_table(self):
+        result = MappingResult.from_test_data(self.df_ideal, self.df_test, self.best_fits)
+        self.assertEqual(result.table['x'].tolist(), [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(result.table['function'].tolist(), [0, -1, 0, 1])
+        self.assertEqual(result.table['function'].dtype, np.int8)
+        self.assertEqual(result.table['deviation'].dtype, np.float32)
+        self.assertEqual(result.table['deviation'].tolist(), [0.5, 5.0, 0.5, 0.5])
+
+    def test_views_match_individual_tables(self):
+        expected = calculate.generate_individual_tables(self.df_ideal, self.df_test, self.best_fits, self.tmp_dir.name)
+        result = MappingResult.from_test_data(self.df_ideal, self.df_test, self.best_fits)
+        self.assertEqual(list(result), ['y1', 'y2'])
+        for column in expected:
+            pd.testing.assert_frame_equal(result[column], expected[column])
+
+    def test_write_true_points(self):
+        result = MappingResult.from_test_data(self.df_ideal, self.df_test, self.best_fits)
+        result.write_true_points(self.tmp_dir.name)
+        true_points = pd.read_csv(os.path.join(self.tmp_dir.name, 'True_Points_y2.csv'))
+        self.assertEqual(true_points['x'].tolist(), [3.0, 4.0])
+
+    def test_missing_x(self):
+        df_test = pd.DataFrame({'x': [1.5], 'y': [0.0]})
+        with self.assertRaises(KeyError):
+            MappingResult.from_test_data(self.df_ideal, df_test, self.best_fits)
+
+    def test_memory_is_smaller(self):
+        rng = np.random.default_rng(10)
+        df_ideal = pd.DataFrame({'x': np.arange(400.0), **{f'y{i}': rng.normal(size=400) for i in range(1, 5)}})
+        df_test = pd.DataFrame({'x': rng.integers(0, 400, 5000).astype(float), 'y': rng.normal(size=5000)})
+        best_fits = {f'y{i}': {'best_fit_col_ideal': f'y{i}'} for i in range(1, 5)}
+        result = MappingResult.from_test_data(df_ideal, df_test, best_fits)
+        full_size = sum(result[column].memory_usage(index=True, deep=True).sum() for column in result)
+        self.assertLess(result.memory_usage() * 4, full_size)
+
+    @patch('matplotlib.pyplot.show')
+    def test_plot_views(self, mock_show):
+        result = MappingResult.from_test_data(self.df_ideal, self.df_test, self.best_fits)
+        ResultVisualizer().plot_result_2(result, self.best_fits)
+        mock_show.assert_called()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
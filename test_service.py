@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+import numpy as np
+import pandas as pd
+from service import MappingModel, MappingService, request_mapping
+
+class TestMappingService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        df_ideal = pd.DataFrame({
+            'x': [1, 2, 3, 4],
+            'y1': [2, 3, 4, 5],
+            'y2': [3, 4, 5, 6]
+        })
+        best_fits = {
+            'y1': {'best_fit_col_ideal': 'y1', 'squared_diff': 0, 'test_column': 'y1'},
+            'y2': {'best_fit_col_ideal': 'y2', 'squared_diff': 0, 'test_column': 'y2'}
+        }
+        self.model = MappingModel(df_ideal, best_fits)
+
+    def test_map_points(self):
+        mapped = self.model.map_points(np.array([1.0, 4.0, 2.5]), np.array([1.5, 6.5, 0.0]))
+        self.assertEqual([m['distance'] for m in mapped[0]['matches']], [0.5, 1.5])
+        self.assertEqual([m['result'] for m in mapped[0]['matches']], [True, False])
+        self.assertEqual(mapped[1]['matches'][1]['ideal_y'], 6.0)
+        self.assertIn('error', mapped[2])
+
+    def test_columns_without_fit_are_skipped(self):
+        df_ideal = pd.DataFrame({'x': [1, 2], 'y1': [2, 3]})
+        best_fits = {
+            'y1': {'best_fit_col_ideal': 'y1', 'squared_diff': 0, 'test_column': 'y1'},
+            'y2': {'best_fit_col_ideal': None, 'squared_diff': float('inf'), 'test_column': 'y2'}
+        }
+        model = MappingModel(df_ideal, best_fits)
+        self.assertEqual(model.unfitted_columns, ['y2'])
+        mapped = model.map_points(np.array([2.0]), np.array([3.5]))
+        self.assertEqual([m['test_column'] for m in mapped[0]['matches']], ['y1'])
+
+    async def test_malformed_points_are_rejected(self):
+        service = MappingService(self.model)
+        for points in ([[1, 2, 3, 4]], [1, 2], [[[1, 2]]]):
+            with self.assertRaises(ValueError):
+                await service.map_points(points)
+
+    async def test_requests_are_batched(self):
+        service = MappingService(self.model, max_batch_size=100, max_latency=0.05)
+        batches = []
+        map_points = self.model.map_points
+        self.model.map_points = lambda x, y: batches.append(len(x)) or map_points(x, y)
+
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            responses = await asyncio.gather(*[
+                request_mapping([[x, x + 1.0]], port=port) for x in [1.0, 2.0, 3.0, 4.0]
+            ])
+        finally:
+            await service.stop()
+
+        self.assertEqual([r['results'][0]['x'] for r in responses], [1.0, 2.0, 3.0, 4.0])
+        self.assertTrue(all(r['results'][0]['matches'][0]['result'] for r in responses))
+        self.assertLess(len(batches), 4)
+        self.assertEqual(sum(batches), 4)
+
+        stats = service.latency_percentiles()
+        self.assertEqual(stats['requests'], 4)
+        self.assertLessEqual(stats['p50'], stats['p99'])
+
+    async def test_invalid_request(self):
+        service = MappingService(self.model)
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'{"unknown": 1}\n{"stats": true}\n')
+            await writer.drain()
+            error = await reader.readline()
+            stats = await reader.readline()
+            writer.close()
+            await writer.wait_closed()
+        finally:
+            await service.stop()
+        self.assertIn(b'error', error)
+        self.assertIn(b'"requests": 0', stats)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
+import os
+import tempfile
 import unittest
 import pandas as pd
 from unittest.mock import patch
-from visio import ResultVisualizer
+from visio import FigureCache, ResultVisualizer
 
 class TestResultVisualizer(unittest.TestCase):
     def setUp(self):
@@ -54,5 +56,64 @@ class TestResultVisualizer(unittest.TestCase):
         visualizer.plot_result_2(self.individual_tables, self.best_fit_result)
         mock_show.assert_called()
 
+class TestFigureCache(unittest.TestCase):
+    def setUp(self):
+        # Same sample data as TestResultVisualizer
+        TestResultVisualizer.setUp(self)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+        self.output_dir = os.path.join(self.tmp_dir.name, 'figures')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def render(self, visualizer):
+        paths = visualizer.plot_results_1(self.df_ideal, self.best_fit_result, self.df_train, output_dir=self.output_dir)
+        paths += visualizer.plot_result_2(self.individual_tables, self.best_fit_result, output_dir=self.output_dir)
+        return paths
+
+    def test_unchanged_figures_are_not_plotted_again(self):
+        first = self.render(ResultVisualizer(cache=FigureCache(self.cache_dir)))
+        with open(first[0], 'rb') as file:
+            content = file.read()
+        for path in first:
+            os.remove(path)
+
+        visualizer = ResultVisualizer(cache=FigureCache(self.cache_dir))
+        with patch('matplotlib.pyplot.savefig') as mock_savefig:
+            second = self.render(visualizer)
+        mock_savefig.assert_not_called()
+        self.assertEqual(second, first)
+        self.assertTrue(all(os.path.exists(path) for path in second))
+        with open(second[0], 'rb') as file:
+            self.assertEqual(file.read(), content)
+        self.assertEqual(visualizer.cache.stats()['hits'], 4)
+        self.assertEqual(visualizer.cache.stats()['misses'], 0)
+
+    def test_changed_data_is_plotted_again(self):
+        cache = FigureCache(self.cache_dir)
+        self.render(ResultVisualizer(cache=cache))
+        self.assertEqual(cache.stats()['misses'], 4)
+
+        self.individual_tables['y2'].loc[0, 'test_y'] = 9.0
+        self.render(ResultVisualizer(cache=cache))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (3, 5, 5))
+
+    def test_key_depends_on_arrays_and_style(self):
+        cache = FigureCache(self.cache_dir)
+        key = cache.key([self.df_ideal['y1'].to_numpy()], {'plot': 'test'})
+        self.assertEqual(key, cache.key([self.df_ideal['y1'].to_numpy()], {'plot': 'test'}))
+        self.assertNotEqual(key, cache.key([self.df_ideal['y2'].to_numpy()], {'plot': 'test'}))
+        self.assertNotEqual(key, cache.key([self.df_ideal['y1'].to_numpy().astype(float)], {'plot': 'test'}))
+        self.assertNotEqual(key, cache.key([self.df_ideal['y1'].to_numpy()], {'plot': 'training'}))
+
+    def test_lru_eviction(self):
+        cache = FigureCache(self.cache_dir, max_bytes=1)
+        self.render(ResultVisualizer(cache=cache))
+        stats = cache.stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertLessEqual(stats['bytes'], os.path.getsize(os.path.join(self.output_dir, 'Test_y2_Ideal_y2.png')))
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,18 +1,119 @@
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Mapping
+import matplotlib
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from lrucache import LRUDirectoryCache
+
+class FigureCache(LRUDirectoryCache):
+    """
+    Bounded on-disk cache of rendered figures.
+
+    Each entry is a PNG file named after the hash of the plotted arrays and the style parameters of
+    the figure. The least recently used entries are evicted once the total size exceeds max_bytes,
+    see lrucache.LRUDirectoryCache.
+
+    Attributes:
+        cache_dir (str): Directory path of the cached figures.
+        max_bytes (int): Maximum total size of the cached figures in bytes.
+        hits (int): Number of cache hits.
+        misses (int): Number of cache misses.
+
+    Methods:
+        key: Method for computing the key of a figure.
+        get: Method for copying a cached figure to its output path.
+        put: Method for storing a rendered figure.
+        stats: Method for reporting the hit/miss statistics.
+    """
+    suffix = '.png'
+
+    def __init__(self, cache_dir='.figure_cache', max_bytes=64 * 1024 * 1024):
+        """
+        Initializes the FigureCache class.
+
+        Parameters:
+            cache_dir (str): Directory path of the cached figures. Default is '.figure_cache'.
+            max_bytes (int): Maximum total size of the cached figures in bytes. Default is 64 MiB.
+        """
+        super().__init__(cache_dir, max_bytes)
+
+    def key(self, arrays, style):
+        """
+        Computes the key of a figure.
+
+        Parameters:
+            arrays (iterable): The plotted arrays.
+            style (dict): JSON-serializable style parameters of the figure.
+
+        Returns:
+            str: The hexadecimal key.
+        """
+        digest = hashlib.sha256()
+        # The matplotlib version is part of the key, an upgrade may change the rendering
+        digest.update(json.dumps({'style': style, 'matplotlib': matplotlib.__version__}, sort_keys=True).encode())
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            digest.update(f'{array.dtype.str}{array.shape}'.encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key, path):
+        """
+        Copies a cached figure to its output path.
+
+        Parameters:
+            key (str): The key of the figure.
+            path (str): The output file path.
+
+        Returns:
+            bool: True on a hit, False on a miss.
+        """
+        try:
+            shutil.copyfile(self._path(key), path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+
+        self._touch(key)
+        return True
+
+    def put(self, key, path):
+        """
+        Stores a rendered figure and evicts the least recently used entries if the cache is too large.
+
+        Parameters:
+            key (str): The key of the figure.
+            path (str): The file path of the rendered figure.
+        """
+        with open(path, 'rb') as figure:
+            self._store(key, lambda file: shutil.copyfileobj(figure, file))
 
 class ResultVisualizer:
     """
     A class for visualizing results of data analysis.
 
+    Attributes:
+        cache (FigureCache): Cache of rendered figures, used when the figures are saved to an output directory.
+
     Methods:
         plot_results_1: Plot the comparison between training data and ideal functions.
         plot result_2: Plot the comparison between the ideal function and the test data.
     """
-    def __init__(self):
-        pass
+    def __init__(self, cache=None):
+        """
+        Initializes the ResultVisualizer class.
+
+        Parameters:
+            cache (FigureCache): If given, saved figures whose data and style are unchanged are copied
+                                 from the cache instead of being plotted again. Default is None.
+        """
+        self.cache = cache
 
-    def plot_results_1(self, df_ideal, best_fit_result, df_train):
+    def plot_results_1(self, df_ideal, best_fit_result, df_train, output_dir=None):
         """
         Plot the comparison between training data and ideal functions.
 
@@ -20,6 +121,10 @@ class ResultVisualizer:
             df_ideal (pd.DataFrame): Ideal dataset with 'x' as the first column and Y columns thereafter.
             best_fit_result (dict): Dictionary containing the best fit in the ideal dataset for each Y-column in the training dataset.
             df_train (pd.DataFrame): Training dataset with 'x' as the first column and Y columns thereafter.
+            output_dir (str): If given, the figures are saved as PNG files in this directory instead of being shown.
+
+        Returns:
+            list: The file paths of the saved figures if output_dir is given, otherwise None.
         """
         try:
             from main import CustomError  # Import CustomError from main.py
@@ -34,9 +139,16 @@ class ResultVisualizer:
 
             # Get the list of Y-columns in the training dataset
             y_columns = df_train.columns[1:]
+            saved_files = []
 
             for idx, col_train in enumerate(y_columns):
                 col_ideal = best_fit_result[col_train]['best_fit_col_ideal']
+                filename = f"Training_{col_train}_Ideal_{col_ideal}.png"
+                arrays = [df_ideal['x'].to_numpy(), df_ideal[col_ideal].to_numpy(), df_train['x'].to_numpy(), df_train[col_train].to_numpy()]
+                hit, key = self._cached_figure(output_dir, filename, arrays, {'plot': 'training', 'col_train': col_train, 'col_ideal': col_ideal})
+                if hit:
+                    saved_files.append(os.path.join(output_dir, filename))
+                    continue
 
                 # Plot the Ideal function as a line
                 plt.figure(figsize=(10, 6))
@@ -50,10 +162,17 @@ class ResultVisualizer:
                 plt.title('Comparison between Training Data and Ideal Functions')
                 plt.legend()
                 plt.grid(True)
-                
+
+                if output_dir is not None:
+                    saved_files.append(self._save_figure(output_dir, filename, key))
+                    continue
+
                 # Show the plot for the current Y-column
                 plt.show()
 
+            if output_dir is not None:
+                return saved_files
+
         except CustomError as e:
             print("Custom Error:", e.message)
             # Perform alternative actions or exit the program
@@ -66,27 +185,41 @@ class ResultVisualizer:
             print("Unexpected Error:", e)
             # Perform alternative actions or exit the program
 
-    def plot_result_2(self, individual_tables, best_fit_result):
+    def plot_result_2(self, individual_tables, best_fit_result, output_dir=None):
         """
         Visualize individual tables as plots.
 
         Parameters:
-            individual_tables (dict): Dictionary containing individual tables for each Y-column in the ideal dataset.
+            individual_tables (dict): Dictionary containing individual tables for each Y-column in the ideal dataset,
+                                      or a results.MappingResult.
             best_fit_result (dict): Dictionary containing the best fit in the ideal dataset for each Y-column in the training dataset.
+            output_dir (str): If given, the figures are saved as PNG files in this directory instead of being shown.
+
+        Returns:
+            list: The file paths of the saved figures if output_dir is given, otherwise None.
         """
         try:
             from main import CustomError  # Import CustomError from main.py
             
             # Check if the input data structures are dictionaries
-            if not isinstance(individual_tables, dict) or not isinstance(best_fit_result, dict):
+            # Mappings like results.MappingResult provide the individual tables as lazy views
+            if not isinstance(individual_tables, Mapping) or not isinstance(best_fit_result, dict):
                 raise CustomError("Input parameters must be dictionaries")
 
+            saved_files = []
             for column, table in individual_tables.items():
                 ideal_y = table['ideal_y']
                 test_y = table['test_y']
                 true_indices = table[table['result'] == True].index
-                ideal_function_name = f"Ideal function ({best_fit_result[column]['best_fit_col_ideal']})"
-                
+                ideal_column = best_fit_result[column]['best_fit_col_ideal']
+                ideal_function_name = f"Ideal function ({ideal_column})"
+                filename = f"Test_{column}_Ideal_{ideal_column}.png"
+                arrays = [table['x'].to_numpy(), ideal_y.to_numpy(), test_y.to_numpy(), table['result'].to_numpy()]
+                hit, key = self._cached_figure(output_dir, filename, arrays, {'plot': 'test', 'column': column, 'ideal_column': ideal_column})
+                if hit:
+                    saved_files.append(os.path.join(output_dir, filename))
+                    continue
+
                 plt.figure(figsize=(10, 6))
                 plt.plot(table['x'], ideal_y, label=f'{ideal_function_name}', color='green')
                 plt.scatter(table['x'], test_y, color='orange', label='Test Data')
@@ -96,7 +229,13 @@ class ResultVisualizer:
                 plt.title(f'Comparison between {ideal_function_name} and Test Data')
                 plt.legend()
                 plt.grid(True)
-              
+
+                if output_dir is not None:
+                    saved_files.append(self._save_figure(output_dir, filename, key))
+
+            if output_dir is not None:
+                return saved_files
+
             # Show all plots
             plt.tight_layout()
             plt.show()
@@ -113,15 +252,42 @@ class ResultVisualizer:
             print("Unexpected Error:", e)
             # Perform alternative actions or exit the program
 
+    def _cached_figure(self, output_dir, filename, arrays, style):
+        """
+        Look up a figure in the cache and copy it to the output directory on a hit.
 
+        Parameters:
+            output_dir (str): Directory path where the figure will be saved, or None if it is shown.
+            filename (str): File name of the figure.
+            arrays (list): The plotted arrays.
+            style (dict): The parameters of the figure that are not part of the arrays.
 
-            
-
-
-
-
-
-
+        Returns:
+            tuple: True on a hit, and the key of the figure, or None if no cache is used.
+        """
+        if output_dir is None or self.cache is None:
+            return False, None
+        os.makedirs(output_dir, exist_ok=True)
+        key = self.cache.key(arrays, dict(style, figsize=[10, 6], dpi=matplotlib.rcParams['savefig.dpi']))
+        return self.cache.get(key, os.path.join(output_dir, filename)), key
 
+    def _save_figure(self, output_dir, filename, key=None):
+        """
+        Save the current figure as a PNG file and close it.
 
+        Parameters:
+            output_dir (str): Directory path where the figure will be saved.
+            filename (str): File name of the figure.
+            key (str): If given, the figure is also stored in the cache under this key.
 
+        Returns:
+            str: The file path of the saved figure.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, filename)
+        plt.tight_layout()
+        plt.savefig(path)
+        plt.close()
+        if key is not None:
+            self.cache.put(key, path)
+        return path